@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import time
+
+import httpx
+from supabase import AsyncClient
+
+from src.api.deps import create_sdb
+from src.crud.book_info import book_info_crud
+from src.crud.users import user_crud
+
+# Concurrency benchmark of the CRUD layer. Runs a fixed number of CRUD reads
+# at increasing numbers of in-flight requests and reports requests per second.
+# With a non-blocking client, throughput should grow with concurrency until
+# the database or connection pool saturates, instead of staying flat.
+#
+# Against a local Supabase (supabase start, settings from .env):
+#   uv run -- python -m benchmarks.crud_concurrency
+# Without a database, serving every request after a fixed delay:
+#   uv run -- python -m benchmarks.crud_concurrency --simulated-latency 0.02
+
+
+def simulated_transport(latency: float) -> httpx.AsyncBaseTransport:
+    """Transport answering every PostgREST request with no rows after latency
+    seconds, standing in for a database round trip"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=[])
+
+    return httpx.MockTransport(handler)
+
+
+async def read(db: AsyncClient, username: str):
+    """One page worth of CRUD reads"""
+    await user_crud.get(db, i=username)
+    await book_info_crud.get_multi_by_owner(db, username=username, columns=("BID",))
+
+
+async def run(db: AsyncClient, *, username: str, requests: int, concurrency: int):
+    """Return requests per second of requests reads, concurrency at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await read(db, username)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[bounded() for _ in range(requests)])
+    return requests / (time.perf_counter() - start)
+
+
+async def main(args):
+    db = await create_sdb()
+    if args.simulated_latency is not None:
+        db.postgrest.session._transport = simulated_transport(args.simulated_latency)
+    try:
+        # Warm up the connection pool before measuring
+        await run(db, username=args.username, requests=10, concurrency=10)
+        baseline = None
+        print(f"{'in-flight':>10} {'req/s':>10} {'speedup':>8}")
+        for concurrency in args.concurrency:
+            rps = await run(
+                db,
+                username=args.username,
+                requests=args.requests,
+                concurrency=concurrency,
+            )
+            baseline = baseline or rps
+            print(f"{concurrency:>10} {rps:>10.1f} {rps / baseline:>7.1f}x")
+    finally:
+        await db.postgrest.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure CRUD read throughput at increasing concurrency"
+    )
+    parser.add_argument("--username", default="benchmark", help="user to read")
+    parser.add_argument(
+        "--requests", type=int, default=200, help="reads per concurrency level"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="in-flight reads to measure",
+    )
+    parser.add_argument(
+        "--simulated-latency",
+        type=float,
+        default=None,
+        help="serve reads from a fake PostgREST after this many seconds",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import json
+
+import asyncpg
+
+from src.config import settings
+
+# Seeds a local Postgres with realistic volumes and checks through EXPLAIN that
+# every hot lookup is served by an index, see the hot lookups migration.
+# Everything runs in one transaction that is rolled back, so the seed never
+# stays behind. Needs the postgres extra and the migrations applied, e.g.
+# supabase start.
+#   uv run --extra postgres -- python -m benchmarks.index_usage
+
+# Seeded keys are offset so they cannot clash with existing rows
+BID_OFFSET = 9_000_000_000_000
+
+SEED = """
+insert into public.users ("UserName", email_address)
+select 'bench_user_' || u, 'bench_user_' || u || '@example.com'
+from generate_series(1, {users}) as u;
+
+insert into public.books_info ("BID", "TitleName")
+select {offset} + b, 'Bench title ' || b
+from generate_series(1, {books}) as b;
+
+insert into public.user_books ("UserName", "BID")
+select distinct
+    'bench_user_' || (1 + (l::bigint * 7919) % {users}),
+    {offset} + 1 + (l::bigint * 104729) % {books}
+from generate_series(1, {user_books}) as l;
+
+insert into public.books_avail ("ItemNo", "CallNumber", "BranchName", "StatusDesc", "InsertTime", "BID")
+select
+    'bench_item_' || i,
+    'call ' || i,
+    'Branch ' || (i % 28) || ' Public Library',
+    case when i % 3 = 0 then 'Available' else 'On Loan' end,
+    1700000000 + i,
+    {offset} + 1 + i % {books}
+from generate_series(1, {books_avail}) as i;
+
+insert into public.user_search ("UserName", search_time, "Title")
+select 'bench_user_' || (1 + s % {users}), 1700000000 + s, 'title ' || s
+from generate_series(1, {searches}) as s;
+"""
+
+# (lookup, table scanned, query, parameters)
+LOOKUPS = [
+    (
+        "user books by UserName",
+        "user_books",
+        'select * from public.user_books where "UserName" = $1',
+        ["bench_user_42"],
+    ),
+    (
+        "books_avail by BID in_ chunk",
+        "books_avail",
+        'select * from public.books_avail where "BID" = any($1::bigint[])',
+        [[BID_OFFSET + b for b in range(1, 101)]],
+    ),
+    (
+        "latest InsertTime of a BID",
+        "books_avail",
+        'select "InsertTime" from public.books_avail where "BID" = $1'
+        ' order by "InsertTime" desc limit 1',
+        [BID_OFFSET + 42],
+    ),
+    (
+        "users by email_address",
+        "users",
+        "select * from public.users where email_address = $1",
+        ["bench_user_42@example.com"],
+    ),
+    (
+        "user search by UserName",
+        "user_search",
+        'select * from public.user_search where "UserName" = $1',
+        ["bench_user_42"],
+    ),
+]
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan"}
+
+
+def table_scans(plan: dict, table: str) -> list[tuple[str, str | None]]:
+    """Return (node type, index name) of every plan node reading table"""
+    scans = []
+    if plan.get("Relation Name") == table:
+        scans.append((plan["Node Type"], plan.get("Index Name")))
+    for child in plan.get("Plans", []):
+        scans.extend(table_scans(child, table))
+    return scans
+
+
+async def main(args) -> bool:
+    conn = await asyncpg.connect(
+        host=args.host,
+        port=args.port,
+        database=settings.SUPA_DB_NAME,
+        user=settings.SUPA_DB_USER,
+        password=settings.SUPA_DB_PASSWORD,
+    )
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        # Summary triggers are irrelevant to the plans and slow the seeding
+        for table in ("user_books", "books_avail"):
+            await conn.execute(f"alter table public.{table} disable trigger user")
+        await conn.execute(
+            SEED.format(
+                offset=BID_OFFSET,
+                users=args.users,
+                books=args.books,
+                user_books=args.user_books,
+                books_avail=args.books_avail,
+                searches=args.searches,
+            )
+        )
+        await conn.execute(
+            "analyze public.users, public.books_info, public.user_books,"
+            " public.books_avail, public.user_search"
+        )
+        # Bitmap scans also use the indexes, but ask for plain index scans so
+        # the plan shows the index is picked per row over a sequential scan
+        await conn.execute("set local enable_bitmapscan = off")
+
+        ok = True
+        for lookup, table, query, params in LOOKUPS:
+            plan = json.loads(
+                await conn.fetchval(f"explain (format json) {query}", *params)
+            )[0]["Plan"]
+            scans = table_scans(plan, table)
+            used = all(node in INDEX_SCANS for node, _ in scans) and scans
+            ok = ok and bool(used)
+            print(
+                f"{'ok  ' if used else 'FAIL'} {lookup}: "
+                + ", ".join(
+                    f"{node} using {index}" if index else node for node, index in scans
+                )
+            )
+        return ok
+    finally:
+        await transaction.rollback()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Seed a local Postgres and check hot lookups use indexes"
+    )
+    parser.add_argument("--host", default=settings.SUPA_DB_HOST)
+    parser.add_argument("--port", type=int, default=int(settings.SUPA_DB_PORT))
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--books", type=int, default=50_000)
+    parser.add_argument("--user-books", type=int, default=200_000)
+    parser.add_argument("--books-avail", type=int, default=400_000)
+    parser.add_argument("--searches", type=int, default=100_000)
+    if not asyncio.run(main(parser.parse_args())):
+        raise SystemExit("Some lookups do not use an index")
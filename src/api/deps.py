@@ -2,35 +2,93 @@
 FastAPI dependencies
 """
 
+import logging
 from typing import Annotated
 
-from fastapi import Cookie, Depends
-from pymongo import MongoClient
-from supabase import create_client, Client
+import httpx
+from fastapi import Cookie, Depends, Request
+from pymongo import AsyncMongoClient
+from supabase import acreate_client, AsyncClient
 from nlb_catalogue_client import AuthenticatedClient
 
-from src import m_db
 from src.config import settings
+from src.crud.user_search import user_search_crud
+from src.modals.user_search import UserSearchCreate
+from src.nlb_api import RateLimitedTransport, nlb_rate_limiter
+from src.utils import BatchWriter
 
 
-def get_sdb():
-    """Return supabase db client connection"""
-    client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+async def create_sdb() -> AsyncClient:
+    """Return async supabase db client with a pooled PostgREST connection.
+    Created once per process in the app lifespan and safe to share between
+    concurrent requests, as every query builds its own request.
+    """
+    client = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+    # Swap the default PostgREST session for one with a sized pool
+    session = client.postgrest.session
+    client.postgrest.session = httpx.AsyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        follow_redirects=True,
+        http2=settings.SUPABASE_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
+    await session.aclose()
+    return client
+
+
+async def check_sdb(client: AsyncClient) -> bool:
+    """Return whether supabase db is reachable"""
     try:
-        yield client
-    finally:
-        client.auth.sign_out()
+        await client.table("users").select("UserName").limit(1).execute()
+    except Exception as error:
+        logging.warning("Supabase health check failed: %s", error)
+        return False
+    return True
+
 
+def get_sdb(request: Request):
+    """Return the shared async supabase db client connection"""
+    return request.app.state.sdb
 
-SDBDep = Annotated[Client, Depends(get_sdb)]
 
+SDBDep = Annotated[AsyncClient, Depends(get_sdb)]
 
-async def get_mdb():
-    """Return mongo db client connection"""
-    yield m_db.connect_mdb()
+
+def create_search_writer(db: AsyncClient) -> BatchWriter[UserSearchCreate]:
+    """Return writer that inserts user searches into supabase db in batches.
+    Created once per process in the app lifespan.
+    """
+
+    async def write(user_searches: list[UserSearchCreate]):
+        await user_search_crud.create_multi(db, obj_ins=user_searches)
+
+    return BatchWriter(
+        write,
+        max_size=settings.SEARCH_TRACKING_BATCH_SIZE,
+        interval=settings.SEARCH_TRACKING_FLUSH_INTERVAL,
+    )
 
 
-MDBDep = Annotated[MongoClient, Depends(get_mdb)]
+def get_search_writer(request: Request):
+    """Return the shared user search writer"""
+    return request.app.state.search_writer
+
+
+SearchWriterDep = Annotated[BatchWriter[UserSearchCreate], Depends(get_search_writer)]
+
+
+def get_mdb(request: Request):
+    """Return the shared mongo db client connection"""
+    return request.app.state.mdb
+
+
+MDBDep = Annotated[AsyncMongoClient, Depends(get_mdb)]
 
 
 def username_email_resol(user_info: Annotated[str | None, Cookie()] = None):
@@ -46,15 +104,36 @@ def username_email_resol(user_info: Annotated[str | None, Cookie()] = None):
 UsernameDep = Annotated[str | None, Depends(username_email_resol)]
 
 
-def get_nlb_api_client():
-    """Return authenticated client to access NLB API"""
-    yield AuthenticatedClient(
+def create_nlb_api_client() -> AuthenticatedClient:
+    """Return authenticated client to access NLB API, backed by a pooled
+    keep-alive connection and the process-wide NLB rate limiter.
+    Created once per process in the app lifespan.
+    """
+    return AuthenticatedClient(
         base_url="https://openweb.nlb.gov.sg/api/v2/Catalogue/",
         auth_header_name="X-API-KEY",
         token=settings.nlb_rest_api_key,
         prefix="",
         headers={"X-APP-Code": settings.nlb_rest_app_id},
+        httpx_args={
+            "transport": RateLimitedTransport(
+                httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=settings.NLB_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.NLB_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.NLB_KEEPALIVE_EXPIRY,
+                    ),
+                    http2=settings.NLB_HTTP2,
+                ),
+                nlb_rate_limiter,
+            ),
+        },
     )
 
 
+def get_nlb_api_client(request: Request):
+    """Return the shared authenticated client to access NLB API"""
+    return request.app.state.nlb_client
+
+
 NLBClientDep = Annotated[AuthenticatedClient, Depends(get_nlb_api_client)]
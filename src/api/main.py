@@ -13,10 +13,8 @@ from src.api.routes.library import router as library_router
 from src.api.routes.nav import router as nav_router
 from src.api.routes.search import router as search_router
 from src.api.routes.user import router as user_router
-from src.crud.book_avail import book_avail_crud
 from src.crud.book_info import book_info_crud
 from src.crud.users import user_crud
-from src.modals.book_response import BookResponse
 from src.utils import templates
 
 api_router = APIRouter()
@@ -40,16 +38,12 @@ async def main(request: Request, username: UsernameDep, db: SDBDep, mdb: MDBDep)
     preferred_lib = user_info.preferred_lib if user_info.preferred_lib else "all"
 
     # Extract user book info and compute book responses
-    book_infos = await book_info_crud.get_multi_by_owner(db=db, username=username)
-    book_avails = await book_avail_crud.get_multi_by_owner(
-        db=db, username=username, BIDs=[book_info.BID for book_info in book_infos]
-    )
-    book_response = BookResponse(
-        book_infos=book_infos, book_avails=book_avails, library=preferred_lib
+    book_response = await book_info_crud.get_book_response_by_owner(
+        db, username=username, library=preferred_lib
     )
 
     update_status = None
-    if m_db.q_status(db=mdb.nlb, username=username):
+    if await m_db.q_status(db=mdb.nlb, username=username):
         update_status = " "
 
     return templates.TemplateResponse(
@@ -59,6 +53,7 @@ async def main(request: Request, username: UsernameDep, db: SDBDep, mdb: MDBDep)
             "username": username,
             "api_data": book_response.api_data,
             "all_avail_books": book_response.all_avail_books,
+            "all_avail_count": len(book_response.all_avail_books),
             "all_unique_books": book_response.all_unique_books,
             "avail_books": book_response.all_avail_books,
             "lib_book_summary": book_response.lib_book_summary,
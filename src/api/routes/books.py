@@ -1,53 +1,70 @@
+import asyncio
+import time
+from typing import Literal, Optional
+
 from fastapi import APIRouter, BackgroundTasks, Form, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from nlb_catalogue_client.api.catalogue import (
-    get_get_availability_info,
-    get_get_title_details,
-)
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from nlb_catalogue_client.api.catalogue import get_get_availability_info
 from nlb_catalogue_client.models.get_availability_info_response_v2 import (
     GetAvailabilityInfoResponseV2,
 )
-from nlb_catalogue_client.models.get_title_details_response_v2 import (
-    GetTitleDetailsResponseV2,
-)
 
-from src import m_db
+from src import m_db, nlb_api
 from src.api.deps import SDBDep, MDBDep, UsernameDep, NLBClientDep
+from src.config import settings
 from src.crud.book_avail import book_avail_crud
 from src.crud.book_info import book_info_crud
 from src.modals.book_avail import BookAvailCreate
-from src.modals.book_info import BookInfoCreate
-from src.modals.book_response import BookResponse
-from src.utils import templates
+from src.modals.lib_book_count import LibBookSummary
+from src.modals.refresh_progress import RefreshProgress
+from src.progress import refresh_progress
+from src.utils import SingleFlight, templates
 
 router = APIRouter()
 
+# Caps in-flight NLB availability refreshes across all users in this process
+refresh_semaphore = asyncio.Semaphore(settings.REFRESH_CONCURRENCY_GLOBAL)
+
+# Shares one availability refresh per BID between concurrent callers
+avail_flights: SingleFlight[int, bool] = SingleFlight()
+
 
 async def update_bk_avail_supa(db, nlb, bid_no: int) -> bool:
     """
     - Takes in single BID to get avail info
+    - Concurrent updates of the same BID share one NLB call and upsert
+    - Skips the NLB call if the stored availability is still fresh
     - Processes data for Supabase
     - Delete existing Supabase data if necessary
     - Inject new data into Supabase
     """
+    bid_no = int(bid_no)
+    return await avail_flights.do(
+        bid_no, lambda: _update_bk_avail_supa(db, nlb, bid_no)
+    )
+
+
+async def fetch_bk_avail(nlb, bid_no: int) -> list[BookAvailCreate]:
+    """Get avail info of a single BID from NLB, empty if none or on error"""
+    response = await get_get_availability_info.asyncio_detailed(client=nlb, brn=bid_no)
+    if (
+        not isinstance(response.parsed, GetAvailabilityInfoResponseV2)  # ErrorResponse
+        or response.parsed.total_records == 0
+    ):
+        # TODO: Display from NLP api to frontend if any
+        return []
+    return [BookAvailCreate.from_nlb(item) for item in response.parsed.items or []]
+
+
+async def _update_bk_avail_supa(db, nlb, bid_no: int) -> bool:
     try:
-        # Make API call on book availability
-        response = await get_get_availability_info.asyncio_detailed(
-            client=nlb, brn=bid_no
-        )
-        if (
-            not isinstance(
-                response.parsed, GetAvailabilityInfoResponseV2
-            )  # ErrorResponse
-            or response.parsed.total_records == 0
-        ):
-            # Return empty table
-            # TODO: Display from NLP api to frontend if any
-            return False
-        all_avail_bks = [
-            BookAvailCreate.from_nlb(item) for item in response.parsed.items or []
-        ]
+        # Books avail rows are shared by users, so another user may have
+        # refreshed this book moments ago
+        insert_time = await book_avail_crud.get_latest_insert_time(db, i=bid_no)
+        if insert_time and time.time() - insert_time < settings.BOOK_AVAIL_FRESHNESS:
+            return True
 
+        all_avail_bks = await fetch_bk_avail(nlb, bid_no)
         if len(all_avail_bks) == 0:
             return False
 
@@ -65,18 +82,98 @@ async def update_bk_avail_supa(db, nlb, bid_no: int) -> bool:
 
 
 async def update_all_user_bks(db, mdb, nlb, username):
-    """Update all books linked to user."""
-    book_infos = await book_info_crud.get_multi_by_owner(db, username=username)
+    """Update all books linked to user.
+
+    Books are refreshed concurrently, bounded per user and per process, while
+    progress is still reported in the order the books are listed.
+    """
+    user_semaphore = asyncio.Semaphore(settings.REFRESH_CONCURRENCY_PER_USER)
+
+    async def refresh(bid: int) -> bool:
+        # Acquire the user slot first so queued books don't hold global slots
+        async with user_semaphore, refresh_semaphore:
+            return await update_bk_avail_supa(db, nlb, bid)
+
+    async def persist(progress: RefreshProgress):
+        await m_db.update_user_info(
+            mdb,
+            username,
+            {
+                "books_updated": progress.books_updated,
+                "title": progress.TitleName,
+                "total_books": progress.total_books,
+            },
+        )
+
+    tasks: list[asyncio.Task] = []
+    try:
+        book_infos = await book_info_crud.get_multi_by_owner(db, username=username)
+        # Tasks copy the current context, so they inherit the background priority
+        with nlb_api.priority(nlb_api.Priority.BACKGROUND):
+            tasks = [asyncio.create_task(refresh(bk.BID)) for bk in book_infos]
 
-    for i, bk in enumerate(book_infos):
-        await update_bk_avail_supa(db, nlb, bk.BID)
-        m_db.update_user_info(
-            mdb, username, {"books_updated": i + 1, "title": bk.TitleName}
+        await refresh_progress.publish(
+            username, RefreshProgress(total_books=len(tasks)), persist
         )
-    m_db.delete_status(mdb, username=username)
+        for i, (bk, task) in enumerate(zip(book_infos, tasks)):
+            await task
+            await refresh_progress.publish(
+                username,
+                RefreshProgress(
+                    total_books=len(tasks), books_updated=i + 1, TitleName=bk.TitleName
+                ),
+                persist,
+            )
+    finally:
+        # Don't leave refreshes running for a run that failed or was cancelled
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await refresh_progress.finish(username, persist)
+        finally:
+            await m_db.delete_status(mdb, username=username)
     return {"message": "All user books updated!"}
 
 
+async def books_page(
+    db,
+    *,
+    username: str,
+    sort: str = "asc.TitleName",
+    q: Optional[str] = None,
+    after=None,
+    start: int = 0,
+) -> dict:
+    """Return template context of a page of user books and the query params
+    of the page after it, if any
+    """
+    direction, column = sort.split(".", 1)
+    book_response = await book_info_crud.get_page_by_owner(
+        db,
+        username=username,
+        sort=column,
+        desc=direction == "desc",
+        search=q,
+        after=after,
+    )
+    books = book_response.book_infos_with_callnumber
+
+    next_page = None
+    if len(books) == settings.BOOKS_PAGE_SIZE:
+        last = books[-1]
+        next_page = {
+            "sort": sort,
+            "after_bid": last["BID"],
+            "start": start + len(books),
+        }
+        if q:
+            next_page["q"] = q
+        if last[column] is not None:
+            next_page["after_value"] = last[column]
+    return {"books": books, "start": start, "next_page": next_page}
+
+
 @router.get("")
 async def get_books(request: Request, username: UsernameDep, db: SDBDep, mdb: MDBDep):
     """Render user books within main_content"""
@@ -84,63 +181,116 @@ async def get_books(request: Request, username: UsernameDep, db: SDBDep, mdb: MD
     if username is None:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
-    update_status = m_db.q_status(db=mdb.nlb, username=username)
-    book_infos = await book_info_crud.get_multi_by_owner(db, username=username)
-    book_avails = await book_avail_crud.get_multi_by_owner(
-        db, username=username, BIDs=[book_info.BID for book_info in book_infos]
-    )
-    book_response = BookResponse(book_infos=book_infos, book_avails=book_avails)
+    update_status = await m_db.q_status(db=mdb.nlb, username=username)
 
     return templates.TemplateResponse(
         "user_bks.html",
         {
             "request": request,
             "username": username,
-            "api_data": book_response.book_infos_with_callnumber,
             "status": update_status,
+            **await books_page(db, username=username),
+        },
+    )
+
+
+BooksSort = Literal["asc.TitleName", "desc.TitleName", "asc.Author", "desc.Author"]
+
+
+@router.get("/page", response_class=HTMLResponse)
+async def get_books_page(
+    request: Request,
+    username: UsernameDep,
+    db: SDBDep,
+    sort: BooksSort = "asc.TitleName",
+    q: Optional[str] = None,
+    after_bid: Optional[int] = None,
+    after_value: Optional[str] = None,
+    start: int = 0,
+):
+    """Render a page of user books for the infinite scroll. Without a cursor,
+    renders the first page, e.g. when the search or sort changes.
+    """
+
+    if username is None:
+        return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
+
+    # An after_bid without after_value means the last book had no sort value
+    after = (after_value, after_bid) if after_bid is not None else None
+    return templates.TemplateResponse(
+        "partials/user_bks_page.html",
+        {
+            "request": request,
+            **await books_page(
+                db, username=username, sort=sort, q=q, after=after, start=start
+            ),
         },
     )
 
 
+def sse_event(event: str, data: str = "") -> str:
+    """Format a Server-Sent Event, data lines each need their own prefix"""
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
+
+
+@router.get("/status/stream")
+async def book_status_stream(username: UsernameDep):
+    """Stream progress of the user's running refresh as Server-Sent Events.
+    Sends a progress event with the rendered status text on every refreshed
+    book, and a done event once the refresh ends.
+    """
+    if username is None:
+        return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
+
+    status_text = templates.get_template("partials/update_status_text.html")
+
+    async def events():
+        async for progress in refresh_progress.subscribe(username, timeout=15):
+            if progress is None:
+                yield ": keep-alive\n\n"
+            elif progress.done:
+                yield sse_event("done")
+            elif progress.TitleName is not None:
+                yield sse_event(
+                    "progress",
+                    status_text.render(
+                        progress=progress.progress,
+                        TitleName=progress.TitleName,
+                        total_books=progress.total_books,
+                        book_count=progress.books_updated,
+                        status=" ",
+                    ),
+                )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/status/{book_saved}")
 async def book_status_progress_bar(
     request: Request, book_saved: int, mdb: MDBDep, username: UsernameDep
 ):
+    """Render progress of the user's refresh, kept for clients polling instead
+    of using the status stream
+    """
     if username is None:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
-    try:
-        user_info = m_db.q_user_info(db=mdb.nlb, username=username)
-        books_updated = user_info.get("books_updated") if user_info else None
-        title = user_info.get("title") if user_info else None
-
-        if books_updated is None or title is None:
-            return templates.TemplateResponse(
-                "/partials/update_status_text.html",
-                {
-                    "request": request,
-                },
-            )
-
-        progress = 0
-        if books_updated > 0:
-            progress = (books_updated / book_saved) * 100
 
-        update_status = None
-        if m_db.q_status(db=mdb.nlb, username=username):
-            update_status = " "
-
-        return templates.TemplateResponse(
-            "/partials/update_status_text.html",
-            {
-                "request": request,
-                "progress": progress,
-                "TitleName": title,
-                "total_books": book_saved,
-                "book_count": books_updated,
-                "status": update_status,
-            },
-        )
-    except Exception:
+    # Fall back to the persisted progress of refreshes run by other processes
+    progress = refresh_progress.get(username)
+    if progress is None:
+        user_info = await m_db.q_user_info(db=mdb.nlb, username=username)
+        if user_info:
+            progress = RefreshProgress(
+                total_books=user_info.get("total_books") or book_saved,
+                books_updated=user_info.get("books_updated") or 0,
+                TitleName=user_info.get("title"),
+            )
+    if progress is None or progress.TitleName is None:
         return templates.TemplateResponse(
             "/partials/update_status_text.html",
             {
@@ -148,10 +298,22 @@ async def book_status_progress_bar(
             },
         )
 
+    return templates.TemplateResponse(
+        "/partials/update_status_text.html",
+        {
+            "request": request,
+            "progress": progress.progress,
+            "TitleName": progress.TitleName,
+            "total_books": progress.total_books,
+            "book_count": progress.books_updated,
+            "status": " ",
+        },
+    )
+
 
 @router.get("/complete", response_class=HTMLResponse)
 async def complete_update(request: Request):
-    return templates.TemplateResponse("complete_status.html", {"request": request})
+    return templates.TemplateResponse("complete-status.html", {"request": request})
 
 
 @router.post("", response_class=HTMLResponse)
@@ -165,31 +327,39 @@ async def ingest_books_navbar(
     if username is None:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
-    for bid in bids:
-        # Makes API to bk info and bk avail and ingest the data into DB
-        response = await get_get_title_details.asyncio_detailed(client=nlb, brn=bid)
-        if not isinstance(response.parsed, GetTitleDetailsResponseV2):
-            # TODO: Log error response
+    # Fetch book info and availability of every bid concurrently. A bid whose
+    # lookups raise (e.g. a transient network error) is dropped, not the batch.
+    bids = list(dict.fromkeys(bids))
+    book_info_results, avail_results = await asyncio.gather(
+        asyncio.gather(
+            *[nlb_api.get_book_info(db, nlb, bid) for bid in bids],
+            return_exceptions=True,
+        ),
+        asyncio.gather(
+            *[fetch_bk_avail(nlb, bid) for bid in bids], return_exceptions=True
+        ),
+    )
+    # TODO: Log error response of books without info
+    new_book_infos, new_book_avails = [], []
+    for book_info, avails in zip(book_info_results, avail_results):
+        if book_info is None or isinstance(book_info, BaseException):
             continue
+        if isinstance(avails, BaseException):
+            continue
+        new_book_infos.append(book_info)
+        new_book_avails.extend(avails)
 
-        # Do all the adding at the end, after everything is confirmed
-        await book_info_crud.create_book_by_user(
-            db,
-            obj_in=BookInfoCreate.from_nlb(response.parsed),
-            username=username,
+    # Bulk write, books_info first as the other tables reference it
+    if new_book_infos:
+        await book_info_crud.create_books_by_user(
+            db, obj_ins=new_book_infos, username=username
         )
-
-        await update_bk_avail_supa(db, nlb, bid)
-
-        print("print started book_available update")
+    if new_book_avails:
+        await book_avail_crud.upsert(db, obj_ins=new_book_avails)
 
     # Update the books calculation on the navbar
-    book_infos = await book_info_crud.get_multi_by_owner(db=db, username=username)
-    book_avails = await book_avail_crud.get_multi_by_owner(
-        db=db, username=username, BIDs=[book_info.BID for book_info in book_infos]
-    )
-    book_response = BookResponse(
-        book_infos=book_infos, book_avails=book_avails, library="all"
+    lib_book_summary = LibBookSummary(
+        lib_counts=await book_avail_crud.get_lib_counts_by_owner(db, username=username)
     )
 
     return templates.TemplateResponse(
@@ -197,9 +367,8 @@ async def ingest_books_navbar(
         {
             "request": request,
             "username": username,
-            "all_avail_books": book_response.all_avail_books,
-            "all_unique_books": book_response.all_unique_books,
-            "lib_book_summary": book_response.lib_book_summary,
+            "all_avail_count": lib_book_summary.all_avail_count,
+            "lib_book_summary": lib_book_summary.lib_book_summary,
         },
     )
 
@@ -216,8 +385,10 @@ async def update_books(
     if not username:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
-    m_db.insert_status(mdb.nlb, username=username)
-    m_db.update_user_info(mdb.nlb, username, {"books_updated": 0})
+    await m_db.insert_status(mdb.nlb, username=username)
+    # Published before the task runs, so the status stream opened by the
+    # redirected page finds the refresh running
+    await refresh_progress.publish(username, RefreshProgress())
 
     # Set background task to query and update all user's books
     background_tasks.add_task(update_all_user_bks, db, mdb.nlb, nlb, username)
@@ -238,15 +409,6 @@ async def delete_book(BID: int, db: SDBDep, username: UsernameDep):
     if not username:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
-    bid = str(BID)
-    owners = await book_info_crud.get_owners(db, i=bid)
-
-    # If book is only linked to one user,
-    # delete book available and info records
-    if len(owners) == 1:
-        await book_avail_crud.delete(db, i=bid)
-        await book_info_crud.delete(db, i=bid)
-        return ""
-
-    await book_info_crud.delete_owner(db, i=bid, username=username)
+    # Also deletes the book and its availability if no one else owns it
+    await book_info_crud.remove_owner(db, i=str(BID), username=username)
     return ""
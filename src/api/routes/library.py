@@ -5,10 +5,8 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 
 from src import m_db
 from src.api.deps import MDBDep, SDBDep, UsernameDep
-from src.crud.book_avail import book_avail_crud
 from src.crud.book_info import book_info_crud
 from src.crud.users import user_crud
-from src.modals.book_response import BookResponse
 from src.utils import templates
 
 
@@ -35,16 +33,12 @@ async def show_avail_bks(
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
     # Extract user book info and compute book responses
-    book_infos = await book_info_crud.get_multi_by_owner(db=db, username=username)
-    book_avails = await book_avail_crud.get_multi_by_owner(
-        db=db, username=username, BIDs=[book_info.BID for book_info in book_infos]
-    )
-    book_response = BookResponse(
-        book_infos=book_infos, book_avails=book_avails, library=library
+    book_response = await book_info_crud.get_book_response_by_owner(
+        db, username=username, library=library
     )
 
     update_status = None
-    if m_db.q_status(db=mdb.nlb, username=username):
+    if await m_db.q_status(db=mdb.nlb, username=username):
         update_status = " "
 
     return templates.TemplateResponse(
@@ -5,17 +5,18 @@ from typing import Optional
 
 from fastapi import APIRouter, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from nlb_catalogue_client.types import UNSET
-from nlb_catalogue_client.api.catalogue import get_get_titles
-from nlb_catalogue_client.models.get_titles_response_v2 import GetTitlesResponseV2
 
 
-from src.api.deps import SDBDep, MDBDep, UsernameDep, NLBClientDep
-from src import m_db
+from src.api.deps import (
+    SDBDep,
+    MDBDep,
+    UsernameDep,
+    NLBClientDep,
+    SearchWriterDep,
+)
+from src import m_db, nlb_api
 from src.crud.book_info import book_info_crud
-from src.crud.user_search import user_search_crud
 from src.modals.user_search import UserSearchCreate
-from src.modals.title import Title
 from src.utils import templates, pg_links
 
 
@@ -35,7 +36,7 @@ async def search_books(
 
     # TODO: Figure out usage of q_status and deprecate if possible
     update_status = None
-    if m_db.q_status(db=mdb.nlb, username=username):
+    if await m_db.q_status(db=mdb.nlb, username=username):
         update_status = " "
 
     return templates.TemplateResponse(
@@ -55,6 +56,7 @@ async def htmx_search(
     request: Request,
     db: SDBDep,
     nlb: NLBClientDep,
+    search_writer: SearchWriterDep,
     username: UsernameDep,
     e_resources: Optional[str] = None,
     book_search: Optional[str] = None,
@@ -76,44 +78,34 @@ async def htmx_search(
         Author=re.sub(r"[^a-zA-Z0-9\s]", " ", author) if author else None,
     )
 
-    # Get titles from NLB API
-    response = await get_get_titles.asyncio_detailed(
-        client=nlb,
-        title=search_input["Title"] if search_input["Title"] else UNSET,
-        author=search_input["Author"] if search_input["Author"] else UNSET,
-        offset=offset if offset else UNSET,
+    # Get titles from NLB API, or from recent identical searches
+    result = await nlb_api.get_titles(
+        nlb,
+        title=search_input["Title"],
+        author=search_input["Author"],
+        offset=offset,
     )
 
-    if (
-        not isinstance(response.parsed, GetTitlesResponseV2)  # ErrorResponse
-        or response.parsed.total_records == 0
-    ):
+    if result is None:
         # Return empty table
         # TODO: Display from NLP api to frontend if any
         return
+    all_titles, total_records, more_records = result
 
-    # Track user search in db
-    await user_search_crud.create(
-        db,
-        obj_in=UserSearchCreate(
+    # Track user search in db, written in batches off the request path
+    search_writer.add(
+        UserSearchCreate(
             UserName=username,
             search_time=int(
                 time.mktime(datetime.now().timetuple()),
             ),
             Title=search_input.get("Title", ""),
             Author=search_input.get("Author", ""),
-        ),
+        )
     )
 
-    total_records = response.parsed.total_records
-    more_records = response.parsed.has_more_records
     # BUG: Total_records does not tally as filterning is not done during API call
     pag_links = pg_links(offset, total_records)  # "all_unique_books": user_bids,.
-    all_titles = (
-        [Title.from_nlb(t) for t in response.parsed.titles]
-        if response.parsed.titles
-        else []
-    )
 
     # Filter whether E-resources are included
     final_titles = list(
@@ -123,7 +115,9 @@ async def htmx_search(
         )
     )
     # Search user book BIDs and disable add book if user saved the book
-    book_infos = await book_info_crud.get_multi_by_owner(db, username=username)
+    book_infos = await book_info_crud.get_multi_by_owner(
+        db, username=username, columns=("BID",)
+    )
     bid_checks = set(str(book_info.BID) for book_info in book_infos)
     for bk in final_titles:
         bk.disabled = bk.BID in bid_checks
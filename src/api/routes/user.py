@@ -1,13 +1,12 @@
-from fastapi import APIRouter, Form, Request, status
+from fastapi import APIRouter, BackgroundTasks, Form, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 
 
-from src import m_db
+from src import cleanup, m_db
 from src.api.deps import SDBDep, MDBDep, UsernameDep
+from src.config import settings
 from src.crud.users import user_crud
 from src.crud.book_avail import book_avail_crud
-from src.crud.book_info import book_info_crud
-from src.modals.book_response import BookResponse
 from src.modals.users import UserUpdate
 from src.utils import templates
 
@@ -27,14 +26,22 @@ async def user_profile(
     if not user_info:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
-    book_infos = await book_info_crud.get_multi_by_owner(db, username=username)
+    # Only branch names are needed to list user libraries
     book_avails = await book_avail_crud.get_multi_by_owner(
-        db, username=username, BIDs=[book_info.BID for book_info in book_infos]
+        db, username=username, columns=("BranchName",)
+    )
+    all_unique_libs = ["all"] + sorted(
+        {
+            book_avail.BranchName.replace("Public", "")
+            .replace("Library", "")
+            .strip()
+            .lower()
+            for book_avail in book_avails
+        }
     )
-    book_response = BookResponse(book_infos=book_infos, book_avails=book_avails)
 
     update_status = None
-    if m_db.q_status(db=mdb.nlb, username=username):
+    if await m_db.q_status(db=mdb.nlb, username=username):
         update_status = " "
 
     # Query user profile info from database
@@ -47,7 +54,7 @@ async def user_profile(
             "preferred_lib": user_info.preferred_lib,
             "pw_qn": user_info.pw_qn,
             "pw_ans": user_info.pw_ans,
-            "all_unique_lib": book_response.all_unique_libs,
+            "all_unique_lib": all_unique_libs,
             "status": update_status,
         },
     )
@@ -83,11 +90,20 @@ async def update_user(
 
 
 @router.delete("", response_class=HTMLResponse)
-async def delete_user(db: SDBDep, username: UsernameDep):
+async def delete_user(
+    db: SDBDep, username: UsernameDep, background_tasks: BackgroundTasks
+):
     if not username:
         return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
 
+    # User books links are deleted with the user by foreign key cascade,
+    # books no one else owns are cleaned up after the response. Bounded, as
+    # the sweep is not limited to this user's books
     await user_crud.delete(db, i=username)
-    # TODO: Remove all books belongs to user
+    background_tasks.add_task(
+        cleanup.delete_orphan_books,
+        db,
+        max_batches=settings.ORPHAN_BOOKS_BATCHES_PER_USER_DELETE,
+    )
 
     return RedirectResponse("/", status_code=status.HTTP_302_FOUND)
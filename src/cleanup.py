@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+from typing import Optional
+
+from supabase import AsyncClient
+
+from src.api.deps import create_sdb
+from src.config import settings
+from src.crud.book_info import book_info_crud
+
+# This script deletes books_info and books_avail rows that no user owns
+# anymore, e.g. after users are deleted. Every book we keep is refreshed and
+# scanned, so orphans cost us NLB quota and database time for nothing.
+#
+# Orphans are found and deleted in the database, one bounded batch per
+# transaction. Run it as a job with:
+#   uv run -- python -m src.cleanup
+
+
+async def delete_orphan_books(
+    db: AsyncClient,
+    *,
+    batch_size: int = settings.ORPHAN_BOOKS_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+) -> dict[str, int]:
+    """Delete orphaned books in batches until none are left, or until
+    max_batches batches were run. Returns the counts of deleted rows.
+    """
+    counts = {"batches": 0, "books_info": 0, "books_avail": 0}
+    while max_batches is None or counts["batches"] < max_batches:
+        books, avails = await book_info_crud.delete_orphans(db, batch_size=batch_size)
+        if books == 0:
+            break
+        counts["batches"] += 1
+        counts["books_info"] += books
+        counts["books_avail"] += avails
+    return counts
+
+
+async def main(batch_size: int, max_batches: Optional[int]) -> dict[str, int]:
+    db = await create_sdb()
+    try:
+        return await delete_orphan_books(
+            db, batch_size=batch_size, max_batches=max_batches
+        )
+    finally:
+        await db.postgrest.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Delete books and availability rows that no user owns"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.ORPHAN_BOOKS_BATCH_SIZE,
+        help="max books deleted per transaction",
+    )
+    parser.add_argument(
+        "--max-batches", type=int, default=None, help="stop after this many batches"
+    )
+    args = parser.parse_args()
+
+    counts = asyncio.run(main(args.batch_size, args.max_batches))
+    print(
+        f"Deleted {counts['books_info']} books and {counts['books_avail']} "
+        f"availability rows in {counts['batches']} batches"
+    )
@@ -1,8 +1,8 @@
 from typing import Generic, Optional, TypeVar
 
-from supabase import Client
+from supabase import AsyncClient
 
-from src.modals.base import CreateBase, ResponseBase, UpdateBase
+from src.modals.base import CreateBase, ResponseBase, UpdateBase, partial_model
 
 ModelT = TypeVar("ModelT", bound=ResponseBase)
 CreateSchemaT = TypeVar("CreateSchemaT", bound=CreateBase)
@@ -15,34 +15,62 @@ class CRUDBase(Generic[ModelT, CreateSchemaT, UpdateSchemaT]):
     def __init__(self, model: type[ModelT]):
         self.model = model
 
-    async def get(self, db: Client, *, i: str) -> ModelT | None:
+    def projection(self, columns: Optional[tuple[str, ...]]) -> tuple[str, type]:
+        """Return select clause and model to parse rows of the given columns.
+        Selects all columns into the full model if columns is None.
+        """
+        if columns is None:
+            return "*", self.model
+        return ",".join(columns), partial_model(self.model, columns)
+
+    async def get(
+        self, db: AsyncClient, *, i: str, columns: Optional[tuple[str, ...]] = None
+    ) -> ModelT | None:
         """get by table_name by id"""
-        response = (
-            db.table(self.model.table_name).select("*").eq(self.model.pk, i).execute()
+        select, model = self.projection(columns)
+        response = await (
+            db.table(self.model.table_name)
+            .select(select)
+            .eq(self.model.pk, i)
+            .execute()
         )
         got = response.data
-        return self.model(**got[0]) if got else None
+        return model(**got[0]) if got else None
 
-    async def get_all(self, db: Client) -> list[ModelT]:
+    async def get_all(
+        self, db: AsyncClient, *, columns: Optional[tuple[str, ...]] = None
+    ) -> list[ModelT]:
         """get all by table_name"""
-        response = db.table(self.model.table_name).select("*").execute()
-        return [self.model(**item) for item in response.data]
+        select, model = self.projection(columns)
+        response = await db.table(self.model.table_name).select(select).execute()
+        return [model(**item) for item in response.data]
 
-    async def get_multi_by_owner(self, db: Client, *, username: str) -> list[ModelT]:
+    async def get_multi_by_owner(
+        self,
+        db: AsyncClient,
+        *,
+        username: str,
+        columns: Optional[tuple[str, ...]] = None,
+    ) -> list[ModelT]:
         """get by owner,use it  if rls failed to use"""
-        response = (
+        select, model = self.projection(columns)
+        response = await (
             db.table(self.model.table_name)
-            .select("*")
+            .select(select)
             .eq("UserName", username)
             .execute()
         )
-        return [self.model(**item) for item in response.data]
+        return [model(**item) for item in response.data]
 
     async def create(
-        self, db: Client, *, obj_in: CreateSchemaT, excludes: Optional[set[str]] = None
+        self,
+        db: AsyncClient,
+        *,
+        obj_in: CreateSchemaT,
+        excludes: Optional[set[str]] = None,
     ) -> ModelT:
         """create by CreateSchemaT"""
-        response = (
+        response = await (
             db.table(self.model.table_name)
             .insert(obj_in.model_dump(exclude=excludes))
             .execute()
@@ -50,16 +78,31 @@ class CRUDBase(Generic[ModelT, CreateSchemaT, UpdateSchemaT]):
 
         return self.model(**response.data[0])
 
+    async def create_multi(
+        self,
+        db: AsyncClient,
+        *,
+        obj_ins: list[CreateSchemaT],
+        excludes: Optional[set[str]] = None,
+    ) -> list[ModelT]:
+        """create many by CreateSchemaT in one insert"""
+        response = await (
+            db.table(self.model.table_name)
+            .insert([obj_in.model_dump(exclude=excludes) for obj_in in obj_ins])
+            .execute()
+        )
+        return [self.model(**created) for created in response.data]
+
     async def update(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: UpdateSchemaT,
         i: str,
         excludes: Optional[set[str]] = None,
     ) -> ModelT:
         """update by UpdateSchemaT"""
-        response = (
+        response = await (
             db.table(self.model.table_name)
             .update(obj_in.model_dump(exclude=excludes, exclude_unset=True))
             .eq(self.model.pk, i)
@@ -70,13 +113,13 @@ class CRUDBase(Generic[ModelT, CreateSchemaT, UpdateSchemaT]):
 
     async def upsert(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_ins: list[CreateSchemaT],
         excludes: Optional[set[str]] = None,
     ) -> list[ModelT]:
         """upsert by UpdateSchemaT"""
-        response = (
+        response = await (
             db.table(self.model.table_name)
             .upsert([obj_in.model_dump(exclude=excludes) for obj_in in obj_ins])
             .execute()
@@ -84,9 +127,9 @@ class CRUDBase(Generic[ModelT, CreateSchemaT, UpdateSchemaT]):
         updateds = response.data
         return [self.model(**updated) for updated in updateds]
 
-    async def delete(self, db: Client, *, i: str) -> ModelT | None:
+    async def delete(self, db: AsyncClient, *, i: str) -> ModelT | None:
         """remove by UpdateSchemaT"""
-        response = (
+        response = await (
             db.table(self.model.table_name).delete().eq(self.model.pk, i).execute()
         )
         deleted = response.data
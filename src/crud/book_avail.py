@@ -1,7 +1,10 @@
+import asyncio
 from typing import Optional
 
-from supabase import Client
+from supabase import AsyncClient
 
+from src import pg_db
+from src.config import settings
 from src.crud.base import CRUDBase
 from src.crud.book_info import book_info_crud
 from src.modals.book_avail import (
@@ -9,38 +12,84 @@ from src.modals.book_avail import (
     BookAvailCreate,
     BookAvailUpdate,
 )
+from src.modals.lib_book_count import LibBookCount
 
 
 class CRUDBookAvail(CRUDBase[BookAvail, BookAvailCreate, BookAvailUpdate]):
     async def create(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: BookAvailCreate,
         excludes: Optional[set[str]] = {"UpdateTime", "StatusDescWithDueDate"},
     ) -> BookAvail:
         return await super().create(db, obj_in=obj_in, excludes=excludes)
 
-    async def get(self, db: Client, *, i: str) -> BookAvail | None:
-        return await super().get(db, i=i)
+    async def get(
+        self, db: AsyncClient, *, i: str, columns: Optional[tuple[str, ...]] = None
+    ) -> BookAvail | None:
+        return await super().get(db, i=i, columns=columns)
 
-    async def get_all(self, db: Client) -> list[BookAvail]:
-        return await super().get_all(db)
+    async def get_all(
+        self, db: AsyncClient, *, columns: Optional[tuple[str, ...]] = None
+    ) -> list[BookAvail]:
+        return await super().get_all(db, columns=columns)
 
     async def get_multi_by_owner(
-        self, db: Client, *, username: str, BIDs: Optional[list[int]] = None
+        self,
+        db: AsyncClient,
+        *,
+        username: str,
+        BIDs: Optional[list[int]] = None,
+        columns: Optional[tuple[str, ...]] = None,
     ) -> list[BookAvail]:
         if BIDs is None:
-            book_infos = await book_info_crud.get_multi_by_owner(db, username=username)
+            book_infos = await book_info_crud.get_multi_by_owner(
+                db, username=username, columns=("BID",)
+            )
             BIDs = [book_info.BID for book_info in book_infos]
-        response = (
-            db.table(self.model.table_name).select("*").in_("BID", BIDs).execute()
+        # Query in chunks of BIDs concurrently, as one in_ filter with every
+        # BID of a large library can exceed URL length limits
+        select, model = self.projection(columns)
+        size = settings.BOOK_AVAIL_BID_CHUNK_SIZE
+        responses = await asyncio.gather(
+            *[
+                db.table(self.model.table_name)
+                .select(select)
+                .in_("BID", BIDs[start : start + size])
+                .execute()
+                for start in range(0, len(BIDs), size)
+            ]
+        )
+        return [model(**item) for response in responses for item in response.data]
+
+    async def get_lib_counts_by_owner(
+        self, db: AsyncClient, *, username: str
+    ) -> list[LibBookCount]:
+        """Get counts of user books per library, kept up to date in the database
+        by triggers on books_avail and user_books
+        """
+        if pg_db.pool is not None:
+            return await pg_db.get_lib_counts_by_owner(username=username)
+        response = await db.rpc("lib_book_counts", {"username": username}).execute()
+        return [LibBookCount(**item) for item in response.data]
+
+    async def get_latest_insert_time(self, db: AsyncClient, *, i: int) -> int | None:
+        """Return the latest InsertTime among availability rows of a BID"""
+        response = await (
+            db.table(self.model.table_name)
+            .select("InsertTime")
+            .eq("BID", i)
+            .order("InsertTime", desc=True)
+            .limit(1)
+            .execute()
         )
-        return [BookAvail(**item) for item in response.data]
+        got = response.data
+        return got[0]["InsertTime"] if got else None
 
     async def update(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: BookAvailUpdate,
         i: str,
@@ -50,14 +99,14 @@ class CRUDBookAvail(CRUDBase[BookAvail, BookAvailCreate, BookAvailUpdate]):
 
     async def upsert(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_ins: list[BookAvailCreate],
         excludes: Optional[set[str]] = {"UpdateTime", "StatusDescWithDueDate"},
     ) -> list[BookAvail]:
         return await super().upsert(db, obj_ins=obj_ins, excludes=excludes)
 
-    async def delete(self, db: Client, *, i: str) -> BookAvail | None:
+    async def delete(self, db: AsyncClient, *, i: str) -> BookAvail | None:
         return await super().delete(db, i=i)
 
 
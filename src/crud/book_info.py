@@ -1,8 +1,12 @@
 from typing import Optional
 
-from supabase import Client
+from supabase import AsyncClient
 
+from src import pg_db
+from src.config import settings
 from src.crud.base import CRUDBase
+from src.modals.book_avail import BookAvail
+from src.modals.book_response import BookResponse
 from src.modals.users import User
 from src.modals.book_info import (
     BookInfo,
@@ -12,10 +16,17 @@ from src.modals.book_info import (
 from src.modals.user_books import UserBook, UserBookCreate
 
 
+def quote_filter_value(value: str) -> str:
+    """Quote a value for a PostgREST logical filter, as it may contain
+    reserved characters like commas and parentheses
+    """
+    return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"'))
+
+
 class CRUDBookInfo(CRUDBase[BookInfo, BookInfoCreate, BookInfoUpdate]):
     async def create(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: BookInfoCreate,
         excludes: Optional[set[str]] = None,
@@ -24,7 +35,7 @@ class CRUDBookInfo(CRUDBase[BookInfo, BookInfoCreate, BookInfoUpdate]):
 
     async def create_book_by_user(
         self,
-        db: Client,
+        db: AsyncClient,
         obj_in: BookInfoCreate,
         username: str,
         excludes: Optional[set[str]] = None,
@@ -33,32 +44,171 @@ class CRUDBookInfo(CRUDBase[BookInfo, BookInfoCreate, BookInfoUpdate]):
 
         # Add user book relationship table
         user_book = UserBookCreate(UserName=username, BID=obj_in.BID)
-        db.table(UserBook.table_name).insert(user_book.model_dump()).execute()
+        await db.table(UserBook.table_name).insert(user_book.model_dump()).execute()
 
         return result[0]
 
-    async def get(self, db: Client, *, i: str) -> BookInfo | None:
-        return await super().get(db, i=i)
+    async def create_books_by_user(
+        self,
+        db: AsyncClient,
+        *,
+        obj_ins: list[BookInfoCreate],
+        username: str,
+        excludes: Optional[set[str]] = None,
+    ) -> list[BookInfo]:
+        """Bulk version of create_book_by_user, in two round trips"""
+        result = await super().upsert(db, obj_ins=obj_ins, excludes=excludes)
 
-    async def get_all(self, db: Client) -> list[BookInfo]:
-        return await super().get_all(db)
+        # Add user book relationship table. The count triggers lock each
+        # linked book, so link in BID order to lock in the same order as
+        # every other writer
+        user_books = [
+            UserBookCreate(UserName=username, BID=bid).model_dump()
+            for bid in sorted({obj_in.BID for obj_in in obj_ins})
+        ]
+        # Books the user already saved (double submits, stale search pages)
+        # are skipped instead of failing the whole batch
+        await (
+            db.table(UserBook.table_name)
+            .upsert(user_books, on_conflict="UserName,BID", ignore_duplicates=True)
+            .execute()
+        )
 
-    async def get_multi_by_owner(self, db: Client, *, username: str) -> list[BookInfo]:
-        response = (
+        return result
+
+    async def get(
+        self, db: AsyncClient, *, i: str, columns: Optional[tuple[str, ...]] = None
+    ) -> BookInfo | None:
+        return await super().get(db, i=i, columns=columns)
+
+    async def get_all(
+        self, db: AsyncClient, *, columns: Optional[tuple[str, ...]] = None
+    ) -> list[BookInfo]:
+        return await super().get_all(db, columns=columns)
+
+    async def get_multi_by_owner(
+        self,
+        db: AsyncClient,
+        *,
+        username: str,
+        columns: Optional[tuple[str, ...]] = None,
+    ) -> list[BookInfo]:
+        select, model = self.projection(columns)
+        response = await (
             db.table("user_books")
-            .select(f"*, {self.model.table_name}(*)")
+            .select(f"{self.model.table_name}({select})")
             .eq("UserName", username)
             .execute()
         )
         return [
-            BookInfo(**item[self.model.table_name])
+            model(**item[self.model.table_name])
             for item in response.data
             if self.model.table_name in item
         ]
 
-    async def get_owners(self, db: Client, *, i: str) -> list[User]:
+    async def get_book_response_by_owner(
+        self, db: AsyncClient, *, username: str, library: str = "all"
+    ) -> BookResponse:
+        """Get user books with their availability in one round trip,
+        by embedding books_avail within books_info within user_books
+        """
+        if pg_db.pool is not None:
+            return await pg_db.get_book_response_by_owner(
+                username=username, library=library
+            )
+        response = await (
+            db.table("user_books")
+            .select(f"{self.model.table_name}(*, {BookAvail.table_name}(*))")
+            .eq("UserName", username)
+            .execute()
+        )
+        book_infos, book_avails = [], []
+        for item in response.data:
+            book_info = item.get(self.model.table_name)
+            if not book_info:
+                continue
+            book_avails.extend(
+                BookAvail(**book_avail)
+                for book_avail in book_info.pop(BookAvail.table_name, None) or []
+            )
+            book_infos.append(BookInfo(**book_info))
+        return BookResponse(
+            book_infos=book_infos, book_avails=book_avails, library=library
+        )
+
+    async def get_page_by_owner(
+        self,
+        db: AsyncClient,
+        *,
+        username: str,
+        sort: str = "TitleName",
+        desc: bool = False,
+        search: Optional[str] = None,
+        after: Optional[tuple[Optional[str], int]] = None,
+        limit: int = settings.BOOKS_PAGE_SIZE,
+    ) -> BookResponse:
+        """Get a page of user books ordered by (sort, BID), starting after the
+        (sort value, BID) keyset cursor of the previous page. Only books whose
+        title or author contains search are included, if given.
+
+        Books without a sort value come last, or first when descending. Each
+        book embeds one availability row, only used for its CallNumber.
+        """
+        if sort not in ("TitleName", "Author"):
+            raise ValueError(f"Cannot sort user books by {sort}")
+
+        query = (
+            db.table(self.model.table_name)
+            .select(
+                f"*, {UserBook.table_name}!inner(UserName),"
+                f" {BookAvail.table_name}(ItemNo, CallNumber, BranchName, BID)"
+            )
+            .eq(f"{UserBook.table_name}.UserName", username)
+        )
+
+        conditions = []
+        if search:
+            pattern = quote_filter_value(f"*{search}*")
+            conditions.append(f"or(TitleName.ilike.{pattern},Author.ilike.{pattern})")
+        if after is not None:
+            value, bid = after
+            op = "lt" if desc else "gt"
+            if value is None and desc:  # Within the leading null values
+                conditions.append(
+                    f"or(and({sort}.is.null,BID.lt.{bid}),{sort}.not.is.null)"
+                )
+            elif value is None:  # Within the trailing null values
+                conditions.append(f"and({sort}.is.null,BID.gt.{bid})")
+            else:
+                value = quote_filter_value(value)
+                conditions.append(
+                    f"or({sort}.{op}.{value},and({sort}.eq.{value},BID.{op}.{bid})"
+                    + ("" if desc else f",{sort}.is.null")
+                    + ")"
+                )
+        if conditions:
+            # A single or_ of one and() applies all conditions together
+            query = query.or_(f"and({','.join(conditions)})")
+
+        response = await (
+            query.order(sort, desc=desc, nullsfirst=desc)
+            .order("BID", desc=desc)
+            .limit(limit)
+            .limit(1, foreign_table=BookAvail.table_name)
+            .execute()
+        )
+        book_infos, book_avails = [], []
+        for book_info in response.data:
+            book_avails.extend(
+                BookAvail(**book_avail)
+                for book_avail in book_info.pop(BookAvail.table_name, None) or []
+            )
+            book_infos.append(BookInfo(**book_info))
+        return BookResponse(book_infos=book_infos, book_avails=book_avails)
+
+    async def get_owners(self, db: AsyncClient, *, i: str) -> list[User]:
         """Get users that owns the given bid"""
-        response = (
+        response = await (
             db.table("user_books")
             .select(f"*, {User.table_name}(*)")
             .eq("BID", i)
@@ -72,7 +222,7 @@ class CRUDBookInfo(CRUDBase[BookInfo, BookInfoCreate, BookInfoUpdate]):
 
     async def update(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: BookInfoUpdate,
         i: str,
@@ -80,8 +230,8 @@ class CRUDBookInfo(CRUDBase[BookInfo, BookInfoCreate, BookInfoUpdate]):
     ) -> BookInfo:
         return await super().update(db, obj_in=obj_in, i=i, excludes=excludes)
 
-    async def delete_owner(self, db: Client, *, i: str, username: str):
-        (
+    async def delete_owner(self, db: AsyncClient, *, i: str, username: str):
+        await (
             db.table("user_books")
             .delete()
             .eq("BID", i)
@@ -89,8 +239,30 @@ class CRUDBookInfo(CRUDBase[BookInfo, BookInfoCreate, BookInfoUpdate]):
             .execute()
         )
 
-    async def delete(self, db: Client, *, i: str) -> BookInfo | None:
-        db.table("user_books").delete().eq("BID", i).execute()
+    async def remove_owner(self, db: AsyncClient, *, i: str, username: str) -> bool:
+        """Unlink the book from the user and delete it, with its availability,
+        if no one else owns it. Done atomically in the database.
+        Returns True if the book itself was deleted.
+        """
+        response = await db.rpc(
+            "remove_user_book", {"username": username, "bid": int(i)}
+        ).execute()
+        return bool(response.data)
+
+    async def delete_orphans(
+        self, db: AsyncClient, *, batch_size: int = settings.ORPHAN_BOOKS_BATCH_SIZE
+    ) -> tuple[int, int]:
+        """Delete a batch of books no user owns, with their availability.
+        Returns the number of book info and book availability rows deleted.
+        """
+        response = await db.rpc(
+            "delete_orphan_books", {"batch_size": batch_size}
+        ).execute()
+        deleted = response.data[0]
+        return deleted["deleted_books"], deleted["deleted_avails"]
+
+    async def delete(self, db: AsyncClient, *, i: str) -> BookInfo | None:
+        await db.table("user_books").delete().eq("BID", i).execute()
         return await super().delete(db, i=i)
 
 
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from supabase import Client
+from supabase import AsyncClient
 
 from src.crud.base import CRUDBase
 from src.modals.user_search import (
@@ -13,33 +13,42 @@ from src.modals.user_search import (
 class CRUDUserSearch(CRUDBase[UserSearch, UserSearchCreate, UserSearchUpdate]):
     async def create(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: UserSearchCreate,
         excludes: Optional[set[str]] = None,
     ) -> UserSearch:
         return await super().create(db, obj_in=obj_in, excludes=excludes)
 
-    async def get(self, db: Client, *, i: str) -> UserSearch | None:
-        return await super().get(db, i=i)
+    async def get(
+        self, db: AsyncClient, *, i: str, columns: Optional[tuple[str, ...]] = None
+    ) -> UserSearch | None:
+        return await super().get(db, i=i, columns=columns)
 
-    async def get_all(self, db: Client) -> list[UserSearch]:
-        return await super().get_all(db)
+    async def get_all(
+        self, db: AsyncClient, *, columns: Optional[tuple[str, ...]] = None
+    ) -> list[UserSearch]:
+        return await super().get_all(db, columns=columns)
 
     async def get_multi_by_owner(
-        self, db: Client, *, username: str
+        self,
+        db: AsyncClient,
+        *,
+        username: str,
+        columns: Optional[tuple[str, ...]] = None,
     ) -> list[UserSearch]:
-        response = (
+        select, model = self.projection(columns)
+        response = await (
             db.table(self.model.table_name)
-            .select("*, user_books(UserName)")
+            .select(f"{select}, user_books(UserName)")
             .eq("UserName", username)
             .execute()
         )
-        return [self.model(**item) for item in response.data]
+        return [model(**item) for item in response.data]
 
     async def update(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: UserSearchUpdate,
         i: str,
@@ -47,7 +56,7 @@ class CRUDUserSearch(CRUDBase[UserSearch, UserSearchCreate, UserSearchUpdate]):
     ) -> UserSearch:
         return await super().update(db, obj_in=obj_in, i=i, excludes=excludes)
 
-    async def delete(self, db: Client, *, i: str) -> UserSearch | None:
+    async def delete(self, db: AsyncClient, *, i: str) -> UserSearch | None:
         return await super().delete(db, i=i)
 
 
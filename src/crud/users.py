@@ -1,6 +1,6 @@
 from typing import Optional
 
-from supabase import Client
+from supabase import AsyncClient
 
 from src.crud.base import CRUDBase
 from src.modals.users import (
@@ -13,18 +13,20 @@ from src.modals.users import (
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     async def create(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: UserCreate,
         excludes: Optional[set[str]] = None,
     ) -> User:
         return await super().create(db, obj_in=obj_in, excludes=excludes)
 
-    async def get(self, db: Client, *, i: str) -> User | None:
-        return await super().get(db, i=i)
+    async def get(
+        self, db: AsyncClient, *, i: str, columns: Optional[tuple[str, ...]] = None
+    ) -> User | None:
+        return await super().get(db, i=i, columns=columns)
 
-    async def get_user_by_email(self, db: Client, *, email: str) -> User | None:
-        response = (
+    async def get_user_by_email(self, db: AsyncClient, *, email: str) -> User | None:
+        response = await (
             db.table(self.model.table_name)
             .select("*")
             .eq("email_address", email)
@@ -33,12 +35,14 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         got = response.data
         return self.model(**got[0]) if got else None
 
-    async def get_all(self, db: Client) -> list[User]:
-        return await super().get_all(db)
+    async def get_all(
+        self, db: AsyncClient, *, columns: Optional[tuple[str, ...]] = None
+    ) -> list[User]:
+        return await super().get_all(db, columns=columns)
 
     async def update(
         self,
-        db: Client,
+        db: AsyncClient,
         *,
         obj_in: UserUpdate,
         i: str,
@@ -46,7 +50,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     ) -> User:
         return await super().update(db, obj_in=obj_in, i=i, excludes=excludes)
 
-    async def delete(self, db: Client, *, i: str) -> User | None:
+    async def delete(self, db: AsyncClient, *, i: str) -> User | None:
         return await super().delete(db, i=i)
 
 
@@ -1,10 +1,12 @@
+import threading
 import time
 from datetime import datetime
 from typing import Dict, List
 
-from pymongo import mongo_client
+from pymongo import AsyncMongoClient, monitoring
 
 from src.config import settings
+from src.utils import TTLCache
 
 # This scripts focus on functions solely to interact with MongoDB. The good
 # thing is that MongoDB has no rate limiting. However, I need to improve on
@@ -12,9 +14,79 @@ from src.config import settings
 # API call portions of my code instead, which is under nlb_api.py
 
 
-def connect_mdb():
-    return mongo_client.MongoClient(
-        str(settings.MONGO_URL), serverSelectionTimeoutMS=5000
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Count MongoDB connection pool events of the app client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.check_out_failed = 0
+        self.cleared = 0
+
+    def _add(self, name: str, value: int = 1):
+        # Events are published from pymongo's background threads too
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+                "open": self.created - self.closed,
+                "in_use": self.checked_out,
+                "created": self.created,
+                "closed": self.closed,
+                "check_out_failed": self.check_out_failed,
+                "cleared": self.cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add("cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add("check_out_failed")
+
+    def connection_checked_out(self, event):
+        self._add("checked_out")
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+
+pool_stats = PoolStats()
+
+
+def connect_amdb():
+    """Return pooled async mongo db client, for use within the event loop"""
+    return AsyncMongoClient(
+        str(settings.MONGO_URL),
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        event_listeners=[pool_stats],
     )
 
 
@@ -52,25 +124,48 @@ def add_book_info(db, books_info_input: Dict):
         return db.books_info.insert_one(books_info_input)
 
 
-def insert_status(db, username: str):
-    return db.user_status.insert_one({"UserName": username, "status": True})
+# Refresh status methods, async as they are called from routes
 
+# q_status results by username, False if no refresh is running. Nearly every
+# page render checks the status, while refreshes are rare.
+status_cache: TTLCache[str, Dict | bool] = TTLCache(
+    settings.STATUS_CACHE_SIZE, settings.STATUS_CACHE_TTL
+)
 
-def delete_status(db, username: str):
-    return db.user_status.delete_many({"UserName": username})
 
+async def insert_status(db, username: str):
+    status = {"UserName": username, "status": True}
+    result = await db.user_status.insert_one(status)
+    status_cache.set(username, status)
+    return result
 
-def q_status(db, username: str):
-    return db.user_status.find_one({"UserName": username})
 
+async def delete_status(db, username: str):
+    result = await db.user_status.delete_many({"UserName": username})
+    status_cache.set(username, False, ttl=settings.STATUS_CACHE_NEGATIVE_TTL)
+    return result
 
-def update_user_info(db, username: str, dict_values_to_add: Dict):
+
+async def q_status(db, username: str):
+    cached = status_cache.get(username)
+    if cached is not None:
+        return cached or None
+
+    status = await db.user_status.find_one({"UserName": username})
+    if status is None:
+        status_cache.set(username, False, ttl=settings.STATUS_CACHE_NEGATIVE_TTL)
+    else:
+        status_cache.set(username, status)
+    return status
+
+
+async def update_user_info(db, username: str, dict_values_to_add: Dict):
     """Update user info"""
     new_dict = {"UserName": username}
     new_dict.update(dict_values_to_add)
     newvalues = {"$set": new_dict}
 
-    db["user_status"].update_one({"UserName": username}, newvalues)
+    await db["user_status"].update_one({"UserName": username}, newvalues)
     return f"Tracked {dict_values_to_add} for {username}"
 
 
@@ -112,9 +207,9 @@ def q_username(db, username: str):
     return db["users"].find_one({"UserName": username}, {"_id": 0})
 
 
-def q_user_info(db, username: str):
-    """Return user username and password from mongo DB"""
-    return db["user_status"].find_one({"UserName": username})
+async def q_user_info(db, username: str):
+    """Return user refresh status from mongo DB"""
+    return await db["user_status"].find_one({"UserName": username})
 
 
 def q_user_bks_full(db, username: str):
@@ -1,3 +1,5 @@
+from contextlib import AsyncExitStack, asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,12 +7,47 @@ from fastapi.staticfiles import StaticFiles
 
 
 # from src.api.main import api_router
+from src import m_db, pg_db
+from src.api.deps import (
+    check_sdb,
+    create_nlb_api_client,
+    create_sdb,
+    create_search_writer,
+)
 from src.config import settings
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create process-wide clients on startup and close them on shutdown"""
+    async with AsyncExitStack() as stack:
+        app.state.nlb_client = await stack.enter_async_context(create_nlb_api_client())
+
+        app.state.sdb = await create_sdb()
+        stack.push_async_callback(app.state.sdb.postgrest.aclose)
+        await check_sdb(app.state.sdb)
+
+        # Direct Postgres reads, a no-op unless SUPA_DB_READS is set
+        await pg_db.connect()
+        stack.push_async_callback(pg_db.close)
+
+        # Entered after the supabase client, so it flushes before it closes
+        app.state.search_writer = await stack.enter_async_context(
+            create_search_writer(app.state.sdb)
+        )
+
+        app.state.mdb = m_db.connect_amdb()
+        stack.push_async_callback(app.state.mdb.close)
+
+        yield
+
+
 # Application code
 app = FastAPI(
-    title=settings.APP_NAME, version=settings.VERSION, description=settings.DESCRIPTION
+    title=settings.APP_NAME,
+    version=settings.VERSION,
+    description=settings.DESCRIPTION,
+    lifespan=lifespan,
 )
 
 if settings.BACKEND_CORS_ORIGINS:
@@ -32,4 +69,13 @@ def redirect():
     return response
 
 
+@app.get("/health")
+async def health():
+    """Report whether process-wide clients can reach their services"""
+    return {
+        "supabase": await check_sdb(app.state.sdb),
+        "mongo_pool": m_db.pool_stats.stats(),
+    }
+
+
 # app.include_router(api_router)
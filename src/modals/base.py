@@ -1,6 +1,7 @@
+from functools import lru_cache
 from typing import ClassVar
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, create_model
 
 
 class CreateBase(BaseModel):
@@ -19,3 +20,20 @@ class ResponseBase(BaseModel):
     Config: ClassVar[ConfigDict] = ConfigDict(
         extra="ignore", arbitrary_types_allowed=True
     )
+
+
+@lru_cache
+def partial_model(model: type[BaseModel], columns: tuple[str, ...]) -> type[BaseModel]:
+    """Return model with only the given columns, so projected queries only
+    validate the columns they select
+    """
+    unknown = set(columns) - model.model_fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown columns for {model.__name__}: {sorted(unknown)}")
+    return create_model(
+        f"Partial{model.__name__}",
+        **{
+            column: (model.model_fields[column].annotation, model.model_fields[column])
+            for column in columns
+        },
+    )
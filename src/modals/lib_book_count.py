@@ -0,0 +1,51 @@
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic.fields import computed_field
+
+
+class LibBookCount(BaseModel):
+    """Per library count of a user's books, from lib_book_counts function"""
+
+    """Cleaned library name, None for the count across all libraries"""
+    BranchName: Optional[str] = None
+
+    """Count of unique books with an available item"""
+    AvailBooks: int
+
+    """Count of unique books with any item"""
+    AllBooks: int
+
+
+class LibBookSummary(BaseModel):
+    lib_counts: list[LibBookCount]
+    library: str = "all"  # Cleaned library name (e.g. jurong west)
+
+    @computed_field
+    @property
+    def all_avail_count(self) -> int:
+        """Return count of books available in any library"""
+        return next((c.AvailBooks for c in self.lib_counts if c.BranchName is None), 0)
+
+    @computed_field
+    @property
+    def lib_book_summary(self) -> list[tuple[str, int]]:
+        """Return list of tuple of cleaned library name and count of unqiue available books, sorted in ascending order"""
+        return sorted(
+            (c.BranchName, c.AvailBooks)
+            for c in self.lib_counts
+            if c.BranchName is not None
+        )
+
+    @computed_field
+    @property
+    def lib_count(self) -> LibBookCount:
+        """Return counts of books in library, or in any library if all"""
+        return next(
+            (
+                c
+                for c in self.lib_counts
+                if (c.BranchName or "all").lower() == self.library.lower()
+            ),
+            LibBookCount(BranchName=self.library, AvailBooks=0, AllBooks=0),
+        )
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic.fields import computed_field
+
+
+class RefreshProgress(BaseModel):
+    """Progress of a user's book availability refresh"""
+
+    """Count of user books to refresh, 0 until the books are listed"""
+    total_books: int = 0
+
+    """Count of books refreshed so far"""
+    books_updated: int = 0
+
+    """Title of the last refreshed book"""
+    TitleName: Optional[str] = None
+
+    """Whether the refresh has ended"""
+    done: bool = False
+
+    @computed_field
+    @property
+    def progress(self) -> float:
+        """Return percentage of books refreshed"""
+        if self.total_books == 0:
+            return 0
+        return self.books_updated / self.total_books * 100
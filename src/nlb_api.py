@@ -0,0 +1,238 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+
+import httpx
+from nlb_catalogue_client import AuthenticatedClient
+from nlb_catalogue_client.api.catalogue import get_get_title_details, get_get_titles
+from nlb_catalogue_client.models.get_title_details_response_v2 import (
+    GetTitleDetailsResponseV2,
+)
+from nlb_catalogue_client.models.get_titles_response_v2 import GetTitlesResponseV2
+from nlb_catalogue_client.types import UNSET
+from supabase import AsyncClient
+
+from src.config import settings
+from src.crud.book_info import book_info_crud
+from src.modals.book_info import BookInfoCreate
+from src.modals.title import Title
+from src.utils import TTLCache
+
+# This script holds the plumbing shared by every NLB catalogue API call. NLB
+# rate limits us per API key, so all calls in the process go through a single
+# token bucket. Interactive calls (search, adding books) are served before
+# background refreshes whenever both are waiting for a token.
+#
+# Search results and bibliographic metadata are also cached here, so repeated
+# searches and popular books do not spend our NLB quota again.
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+nlb_priority: ContextVar[Priority] = ContextVar(
+    "nlb_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def priority(value: Priority):
+    """Run NLB API calls within the block at the given priority"""
+    token = nlb_priority.set(value)
+    try:
+        yield
+    finally:
+        nlb_priority.reset(token)
+
+
+class RateLimiter:
+    """Async token bucket that serves waiters by priority, then arrival"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE):
+        """Wait until a token is available for the given priority"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if (
+            self._dispatcher is None
+            or self._dispatcher.done()
+            or self._dispatcher.get_loop() is not loop
+        ):
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def penalize(self, delay: float):
+        """Hold back every waiter for delay seconds, e.g. on HTTP 429"""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + delay)
+        self._tokens = 0.0
+        self._updated = now
+
+    async def _dispatch(self):
+        while self._waiters:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+
+            self._refill(now)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():  # Skip waiters that were cancelled
+                self._tokens -= 1
+                future.set_result(None)
+
+
+def retry_after(headers: httpx.Headers, default: float = 2.0) -> float:
+    """Return seconds to wait from a Retry-After header (seconds or HTTP date)"""
+    value = headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(tz=timezone.utc)).total_seconds(), 0.0)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that takes a rate limiter token before every request.
+
+    Sitting below the NLB client means retries made by the client itself are
+    rate limited too.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.acquire(nlb_priority.get())
+        response = await self.transport.handle_async_request(request)
+        if response.status_code == 429:
+            self.limiter.penalize(retry_after(response.headers))
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+nlb_rate_limiter = RateLimiter(settings.NLB_RATE_LIMIT, settings.NLB_RATE_BURST)
+
+
+# GetTitles search results by normalized (title, author, offset)
+titles_cache: TTLCache[tuple[str, str, int], tuple[list[Title], int, bool]] = TTLCache(
+    settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL
+)
+
+
+def titles_cache_key(
+    title: str | None, author: str | None, offset: int | None
+) -> tuple[str, str, int]:
+    """Case-fold and collapse whitespace so equivalent searches share a key"""
+    return (
+        " ".join((title or "").split()).casefold(),
+        " ".join((author or "").split()).casefold(),
+        offset or 0,
+    )
+
+
+async def get_titles(
+    nlb: AuthenticatedClient,
+    *,
+    title: str | None,
+    author: str | None,
+    offset: int | None,
+) -> tuple[list[Title], int, bool] | None:
+    """Return titles, total records and has more records of a GetTitles
+    search, or None if NLB returns an error or no records
+    """
+    key = titles_cache_key(title, author, offset)
+    cached = titles_cache.get(key)
+    if cached is None:
+        response = await get_get_titles.asyncio_detailed(
+            client=nlb,
+            title=title if title else UNSET,
+            author=author if author else UNSET,
+            offset=offset if offset else UNSET,
+        )
+        if (
+            not isinstance(response.parsed, GetTitlesResponseV2)  # ErrorResponse
+            or response.parsed.total_records == 0
+        ):
+            return None
+
+        cached = (
+            [Title.from_nlb(t) for t in response.parsed.titles or []],
+            response.parsed.total_records,
+            response.parsed.has_more_records,
+        )
+        titles_cache.set(key, cached)
+
+    titles, total_records, more_records = cached
+    # Titles are flagged per user later on, so hand out copies
+    return [t.model_copy() for t in titles], total_records, more_records
+
+
+# GetTitleDetails book info by BID. Bibliographic metadata rarely changes.
+title_details_cache: TTLCache[int, BookInfoCreate] = TTLCache(
+    settings.TITLE_DETAILS_CACHE_SIZE, settings.TITLE_DETAILS_CACHE_TTL
+)
+
+
+async def get_book_info(
+    db: AsyncClient, nlb: AuthenticatedClient, bid: int
+) -> BookInfoCreate | None:
+    """Return book info of a BID from memory, Supabase or NLB GetTitleDetails,
+    in that order. Returns None if NLB returns an error.
+    """
+    bid = int(bid)
+    book_info = title_details_cache.get(bid)
+    if book_info is not None:
+        return book_info
+
+    # Another user may have saved this book already
+    stored = await book_info_crud.get(db, i=str(bid))
+    if stored:
+        book_info = BookInfoCreate(**stored.model_dump())
+    else:
+        response = await get_get_title_details.asyncio_detailed(client=nlb, brn=bid)
+        if not isinstance(response.parsed, GetTitleDetailsResponseV2):
+            return None
+        book_info = BookInfoCreate.from_nlb(response.parsed)
+
+    title_details_cache.set(bid, book_info)
+    return book_info
@@ -0,0 +1,90 @@
+from collections.abc import Mapping
+
+from src.config import settings
+from src.modals.book_avail import BookAvail
+from src.modals.book_info import BookInfo
+from src.modals.book_response import BookResponse
+from src.modals.lib_book_count import LibBookCount
+
+try:
+    import asyncpg
+except ImportError:  # The postgres extra, only needed if SUPA_DB_READS is on
+    asyncpg = None
+
+# This script reads the hottest queries straight from Postgres through an
+# asyncpg pool, skipping the PostgREST HTTP hop. asyncpg prepares and caches
+# every statement per connection and decodes rows with the binary protocol.
+# It is off unless SUPA_DB_READS is set, in which case the CRUD methods for
+# the library snapshot and library counts use this pool.
+
+pool: "asyncpg.Pool | None" = None
+
+LIBRARY_SNAPSHOT_QUERY = """
+select
+    bi."BID", bi."TitleName", bi."Author", bi."PublishYear", bi."Publisher",
+    bi."Subjects", bi.isbns,
+    ba."ItemNo", ba."CallNumber", ba."BranchName", ba."StatusDesc",
+    ba."InsertTime", ba."DueDate"
+from public.user_books ub
+join public.books_info bi on bi."BID" = ub."BID"
+left join public.books_avail ba on ba."BID" = ub."BID"
+where ub."UserName" = $1
+"""
+
+LIB_BOOK_COUNTS_QUERY = """
+select "BranchName", "AvailBooks", "AllBooks" from public.lib_book_counts($1)
+"""
+
+
+async def connect():
+    """Create the process-wide pool if direct reads are enabled"""
+    global pool
+    if not settings.SUPA_DB_READS:
+        return
+    if asyncpg is None:
+        raise RuntimeError("SUPA_DB_READS requires asyncpg, install the postgres extra")
+    pool = await asyncpg.create_pool(
+        host=settings.SUPA_DB_HOST,
+        port=int(settings.SUPA_DB_PORT),
+        database=settings.SUPA_DB_NAME,
+        user=settings.SUPA_DB_USER,
+        password=settings.SUPA_DB_PASSWORD,
+        min_size=settings.SUPA_DB_POOL_MIN_SIZE,
+        max_size=settings.SUPA_DB_POOL_MAX_SIZE,
+    )
+
+
+async def close():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+def _pick(row: Mapping, fields) -> dict:
+    return {field: row[field] for field in fields}
+
+
+async def get_book_response_by_owner(
+    *, username: str, library: str = "all"
+) -> BookResponse:
+    """Get user books with their availability in one query"""
+    rows = await pool.fetch(LIBRARY_SNAPSHOT_QUERY, username)
+    book_infos: dict[int, BookInfo] = {}
+    book_avails: list[BookAvail] = []
+    for row in rows:
+        if row["BID"] not in book_infos:
+            book_infos[row["BID"]] = BookInfo(**_pick(row, BookInfo.model_fields))
+        if row["ItemNo"] is not None:  # Book without availability rows
+            book_avails.append(BookAvail(**_pick(row, BookAvail.model_fields)))
+    return BookResponse(
+        book_infos=list(book_infos.values()),
+        book_avails=book_avails,
+        library=library,
+    )
+
+
+async def get_lib_counts_by_owner(*, username: str) -> list[LibBookCount]:
+    """Get counts of user books per library"""
+    rows = await pool.fetch(LIB_BOOK_COUNTS_QUERY, username)
+    return [LibBookCount(**row) for row in rows]
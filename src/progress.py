@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Optional
+
+from src.config import settings
+from src.modals.refresh_progress import RefreshProgress
+
+# This script holds the progress of the book refreshes running in this
+# process. Refresh jobs publish to it after every book and the status stream
+# subscribes to it, so progress reaches the browser as it happens without a
+# round trip to MongoDB.
+#
+# Progress is still persisted to the status store for anything outside this
+# process, but throttled to one write every few seconds or every few books,
+# plus a final write when the refresh ends.
+
+Persist = Callable[[RefreshProgress], Awaitable]
+
+
+class ProgressRegistry:
+    """Latest refresh progress per user, with subscribers notified on change"""
+
+    def __init__(self, *, persist_interval: float, persist_every: int):
+        self.persist_interval = persist_interval
+        self.persist_every = persist_every
+        self._latest: dict[str, RefreshProgress] = {}
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        # Time and books_updated of the last persisted progress per user
+        self._persisted: dict[str, tuple[float, int]] = {}
+
+    def get(self, username: str) -> RefreshProgress | None:
+        """Return progress of the user's running refresh, if any"""
+        return self._latest.get(username)
+
+    async def publish(
+        self,
+        username: str,
+        progress: RefreshProgress,
+        persist: Optional[Persist] = None,
+    ):
+        """Record progress and pass it on to every subscriber of the user.
+        If given, persist is awaited with the progress when the last persisted
+        one is old enough, far enough behind, or the refresh is done. Errors
+        from persist are logged, not raised.
+        """
+        if progress.done:
+            self._latest.pop(username, None)
+        else:
+            self._latest[username] = progress
+        for queue in self._subscribers.get(username, ()):
+            # Subscribers only need the latest progress, drop any unread one
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(progress)
+
+        now = time.monotonic()
+        persisted_at, persisted_books = self._persisted.get(username, (0.0, 0))
+        if persist is not None and (
+            progress.done
+            or now - persisted_at >= self.persist_interval
+            or progress.books_updated - persisted_books >= self.persist_every
+        ):
+            # Best effort, a failed write must not stop the refresh
+            try:
+                await persist(progress)
+            except Exception as error:
+                logging.error("Failed to persist progress of %s: %s", username, error)
+            else:
+                self._persisted[username] = (now, progress.books_updated)
+        if progress.done:
+            self._persisted.pop(username, None)
+
+    async def finish(self, username: str, persist: Optional[Persist] = None):
+        """Mark the user's refresh as ended"""
+        progress = self._latest.get(username) or RefreshProgress()
+        await self.publish(
+            username, progress.model_copy(update={"done": True}), persist
+        )
+
+    async def subscribe(
+        self, username: str, *, timeout: Optional[float] = None
+    ) -> AsyncIterator[RefreshProgress | None]:
+        """Yield the current and every following progress of the user's
+        refresh until it is done. Yields None after timeout seconds without
+        progress, so callers can send keep-alives.
+        """
+        queue: asyncio.Queue[RefreshProgress] = asyncio.Queue(maxsize=1)
+        self._subscribers[username].add(queue)
+        try:
+            progress = self._latest.get(username) or RefreshProgress(done=True)
+            while True:
+                yield progress
+                if progress is not None and progress.done:
+                    return
+                try:
+                    progress = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    progress = None
+        finally:
+            self._subscribers[username].discard(queue)
+            if not self._subscribers[username]:
+                del self._subscribers[username]
+
+
+refresh_progress = ProgressRegistry(
+    persist_interval=settings.REFRESH_PROGRESS_PERSIST_INTERVAL,
+    persist_every=settings.REFRESH_PROGRESS_PERSIST_EVERY,
+)
@@ -1,5 +1,14 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
 from fastapi.templating import Jinja2Templates
 
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
 # Jinja2 Templates
 templates = Jinja2Templates(directory="templates")
 
@@ -14,3 +23,126 @@ def pg_links(offset, total):
     last = items * (total // items) if next is not None else None
 
     return {"previous": previous, "current": current, "next": next, "last": last}
+
+
+class SingleFlight(Generic[K, T]):
+    """Coalesce concurrent calls sharing a key into one in-flight call"""
+
+    def __init__(self):
+        self._flights: dict[K, asyncio.Future[T]] = {}
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await the in-flight call for key, or start one with fn"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(fn())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        # Shield so one cancelled caller does not cancel the call for the rest
+        return await asyncio.shield(flight)
+
+
+class TTLCache(Generic[K, T]):
+    """Bounded LRU cache whose entries expire ttl seconds after being set"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> T | None:
+        """Return cached value of key, or None if missing or expired"""
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: K, value: T, ttl: float | None = None):
+        """Cache value of key, evicting the least recently used if full"""
+        expiry = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expiry, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K):
+        """Remove key from cache if present"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class BatchWriter(Generic[T]):
+    """Buffer items in memory and write them in batches, once max_size items
+    are buffered or every interval seconds. Use as an async context manager
+    to run the timed flushes and flush what is left on exit.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[list[T]], Awaitable[object]],
+        *,
+        max_size: int,
+        interval: float,
+    ):
+        self.write = write
+        self.max_size = max_size
+        self.interval = interval
+        self._buffer: list[T] = []
+        self._lock = asyncio.Lock()
+        # Flushes in flight, awaited on exit so their batches are not lost
+        self._tasks: set[asyncio.Task] = set()
+        self._periodic: asyncio.Task | None = None
+
+    def add(self, item: T):
+        """Buffer item without waiting for it to be written"""
+        self._buffer.append(item)
+        if len(self._buffer) >= self.max_size:
+            self._start_flush()
+
+    def _start_flush(self) -> asyncio.Task:
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def flush(self):
+        """Write all buffered items in one batch"""
+        async with self._lock:
+            items, self._buffer = self._buffer, []
+            if not items:
+                return
+            try:
+                await self.write(items)
+            except Exception as error:
+                logging.error(
+                    "Failed to write batch of %d items: %s", len(items), error
+                )
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # Shielded, cancelling the timer must not cancel a write under way
+            await asyncio.shield(self._start_flush())
+
+    async def __aenter__(self) -> "BatchWriter[T]":
+        self._periodic = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *args):
+        if self._periodic is not None:
+            self._periodic.cancel()
+            await asyncio.gather(self._periodic, return_exceptions=True)
+            self._periodic = None
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
@@ -0,0 +1,27 @@
+-- Count a user's available and saved books per library, so pages can render
+-- library counts without fetching every books_avail row of the user.
+-- Branch names are cleaned the same way as in the app, e.g. "Jurong West".
+-- The row with a null "BranchName" counts books across all libraries.
+create or replace function public.lib_book_counts(username text)
+returns table ("BranchName" text, "AvailBooks" bigint, "AllBooks" bigint)
+language sql
+stable
+as $$
+    select
+        user_avails."BranchName",
+        count(distinct user_avails."BID")
+            filter (where user_avails."StatusDesc" = 'Available') as "AvailBooks",
+        count(distinct user_avails."BID") as "AllBooks"
+    from (
+        select
+            trim(replace(replace(ba."BranchName", 'Public', ''), 'Library', ''))
+                as "BranchName",
+            ba."BID",
+            ba."StatusDesc"
+        from public.user_books ub
+        join public.books_avail ba on ba."BID" = ub."BID"
+        where ub."UserName" = lib_book_counts.username
+    ) as user_avails
+    group by grouping sets ((user_avails."BranchName"), ())
+    order by user_avails."BranchName" nulls first;
+$$;
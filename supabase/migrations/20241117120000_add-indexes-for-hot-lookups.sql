@@ -0,0 +1,16 @@
+-- Indexes for the lookups made on every request
+
+-- Library snapshot, owner and lib_book_counts queries
+create index if not exists "user_books_UserName_idx" on public.user_books using btree ("UserName");
+
+create index if not exists "user_books_BID_idx" on public.user_books using btree ("BID");
+
+-- Availability by BID (in_ filters, embeds and cascades), and the latest
+-- InsertTime of a BID when checking whether a refresh is needed
+create index if not exists "books_avail_BID_InsertTime_idx" on public.books_avail using btree ("BID", "InsertTime" desc);
+
+-- get_user_by_email on every login
+create index if not exists "users_email_address_idx" on public.users using btree (email_address);
+
+-- Search history by user
+create index if not exists "user_search_UserName_idx" on public.user_search using btree ("UserName");
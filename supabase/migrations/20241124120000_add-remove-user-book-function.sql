@@ -0,0 +1,30 @@
+-- Unlink a book from a user and delete the book once nobody owns it, in one
+-- transaction. Returns true if the book itself was deleted.
+-- books_avail rows go with books_info through the ON DELETE CASCADE foreign key.
+create or replace function public.remove_user_book(username text, bid bigint)
+returns boolean
+language plpgsql
+volatile
+as $$
+begin
+    -- Lock the book first, so concurrent removals by its last owners serialize
+    -- and a concurrent save (which key share locks it) waits for us
+    perform 1
+    from public.books_info bi
+    where bi."BID" = remove_user_book.bid
+    for update;
+
+    delete from public.user_books ub
+    where ub."UserName" = remove_user_book.username
+        and ub."BID" = remove_user_book.bid;
+
+    if exists (
+        select 1 from public.user_books ub where ub."BID" = remove_user_book.bid
+    ) then
+        return false;
+    end if;
+
+    delete from public.books_info bi where bi."BID" = remove_user_book.bid;
+    return found;
+end;
+$$;
@@ -0,0 +1,48 @@
+-- Delete up to batch_size books that no user owns, with their availability.
+-- Returns the number of books_info and books_avail rows deleted, so callers
+-- can loop in bounded batches until nothing is left.
+create or replace function public.delete_orphan_books(batch_size integer)
+returns table (deleted_books bigint, deleted_avails bigint)
+language plpgsql
+volatile
+as $$
+declare
+    orphan_bids bigint[];
+begin
+    -- Lock a batch of orphans, skipping books another transaction holds
+    select array_agg(orphans."BID") into orphan_bids
+    from (
+        select bi."BID"
+        from public.books_info bi
+        where not exists (
+            select 1 from public.user_books ub where ub."BID" = bi."BID"
+        )
+        order by bi."BID"
+        limit batch_size
+        for update skip locked
+    ) as orphans;
+
+    if orphan_bids is null then
+        return query select 0::bigint, 0::bigint;
+        return;
+    end if;
+
+    -- Check ownership again with a fresh snapshot, in case a user saved one
+    -- of the books before we locked it
+    delete from public.books_avail ba
+    where ba."BID" = any(orphan_bids)
+        and not exists (
+            select 1 from public.user_books ub where ub."BID" = ba."BID"
+        );
+    get diagnostics deleted_avails = row_count;
+
+    delete from public.books_info bi
+    where bi."BID" = any(orphan_bids)
+        and not exists (
+            select 1 from public.user_books ub where ub."BID" = bi."BID"
+        );
+    get diagnostics deleted_books = row_count;
+
+    return next;
+end;
+$$;
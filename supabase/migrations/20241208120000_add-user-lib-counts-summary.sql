@@ -0,0 +1,256 @@
+-- Keep each user's available and saved book counts per library in a summary
+-- table, so lib_book_counts is an indexed read of one row per library instead
+-- of a scan over every books_avail row of the user.
+--
+-- Counts are maintained incrementally by triggers in two steps:
+-- 1. book_lib_status holds one row per book and library the book has items in,
+--    flagging whether any item there is available. It is refreshed for the
+--    BIDs touched by every books_avail statement.
+-- 2. Changes to book_lib_status rows and to user_books links add or subtract
+--    their counts from the rows of the users owning the book.
+-- An empty "BranchName" holds the counts across all libraries.
+
+create table if not exists public.book_lib_status (
+    "BID" bigint not null,
+    "BranchName" text not null,
+    "Avail" boolean not null,
+    primary key ("BID", "BranchName")
+);
+
+create table if not exists public.user_lib_counts (
+    "UserName" text not null references public.users ("UserName") on update cascade on delete cascade,
+    "BranchName" text not null,
+    "AvailBooks" bigint not null default 0,
+    "AllBooks" bigint not null default 0,
+    primary key ("UserName", "BranchName")
+);
+
+
+-- Add (or with sign -1, subtract) book library status rows to user counts
+create or replace function public.apply_user_lib_counts(
+    usernames text[], branch_names text[], avails boolean[], sign integer
+)
+returns void
+language plpgsql
+volatile
+as $$
+begin
+    if sign > 0 then
+        insert into public.user_lib_counts as ulc
+            ("UserName", "BranchName", "AvailBooks", "AllBooks")
+        select d.username, d.branch_name, sum(d.avail::integer), count(*)
+        from unnest(usernames, branch_names, avails) as d(username, branch_name, avail)
+        group by d.username, d.branch_name
+        on conflict ("UserName", "BranchName") do update
+        set "AvailBooks" = ulc."AvailBooks" + excluded."AvailBooks",
+            "AllBooks" = ulc."AllBooks" + excluded."AllBooks";
+    else
+        -- Update only, the user may be being deleted
+        update public.user_lib_counts ulc
+        set "AvailBooks" = ulc."AvailBooks" - d.avail_books,
+            "AllBooks" = ulc."AllBooks" - d.all_books
+        from (
+            select d.username, d.branch_name,
+                sum(d.avail::integer) as avail_books, count(*) as all_books
+            from unnest(usernames, branch_names, avails) as d(username, branch_name, avail)
+            group by d.username, d.branch_name
+        ) as d
+        where ulc."UserName" = d.username and ulc."BranchName" = d.branch_name;
+
+        delete from public.user_lib_counts ulc
+        where ulc."UserName" = any(usernames) and ulc."AllBooks" <= 0;
+    end if;
+end;
+$$;
+
+
+-- Recompute book_lib_status of the given BIDs from books_avail
+create or replace function public.refresh_book_lib_status(bids bigint[])
+returns void
+language plpgsql
+volatile
+as $$
+begin
+    with new_status as (
+        select
+            avails."BID",
+            coalesce(avails."BranchName", '') as "BranchName",
+            coalesce(bool_or(avails."StatusDesc" = 'Available'), false) as "Avail"
+        from (
+            select
+                ba."BID",
+                trim(replace(replace(ba."BranchName", 'Public', ''), 'Library', ''))
+                    as "BranchName",
+                ba."StatusDesc"
+            from public.books_avail ba
+            where ba."BID" = any(bids)
+        ) as avails
+        group by grouping sets ((avails."BID", avails."BranchName"), (avails."BID"))
+    ),
+    deleted as (
+        delete from public.book_lib_status bls
+        where bls."BID" = any(bids)
+            and not exists (
+                select 1 from new_status n
+                where n."BID" = bls."BID" and n."BranchName" = bls."BranchName"
+            )
+    )
+    -- Rows whose flag did not change are left alone, so their triggers do not fire
+    insert into public.book_lib_status as bls
+    select n."BID", n."BranchName", n."Avail"
+    from new_status n
+    on conflict ("BID", "BranchName") do update
+    set "Avail" = excluded."Avail"
+    where bls."Avail" is distinct from excluded."Avail";
+end;
+$$;
+
+
+-- books_avail statement triggers, one per event as transition tables require
+create or replace function public.books_avail_refresh_lib_status()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        perform public.refresh_book_lib_status(
+            array(select distinct n."BID" from new_rows n)
+        );
+    elsif tg_op = 'UPDATE' then
+        perform public.refresh_book_lib_status(
+            array(
+                select n."BID" from new_rows n
+                union
+                select o."BID" from old_rows o
+            )
+        );
+    else
+        perform public.refresh_book_lib_status(
+            array(select distinct o."BID" from old_rows o)
+        );
+    end if;
+    return null;
+end;
+$$;
+
+create or replace trigger books_avail_insert_lib_status
+after insert on public.books_avail
+referencing new table as new_rows
+for each statement execute function public.books_avail_refresh_lib_status();
+
+create or replace trigger books_avail_update_lib_status
+after update on public.books_avail
+referencing old table as old_rows new table as new_rows
+for each statement execute function public.books_avail_refresh_lib_status();
+
+create or replace trigger books_avail_delete_lib_status
+after delete on public.books_avail
+referencing old table as old_rows
+for each statement execute function public.books_avail_refresh_lib_status();
+
+
+-- book_lib_status row changes, applied to every owner of the book
+create or replace function public.book_lib_status_apply_counts()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.apply_user_lib_counts(
+            array_agg(ub."UserName"),
+            array_agg(old."BranchName"),
+            array_agg(old."Avail"),
+            -1
+        )
+        from public.user_books ub
+        where ub."BID" = old."BID";
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.apply_user_lib_counts(
+            array_agg(ub."UserName"),
+            array_agg(new."BranchName"),
+            array_agg(new."Avail"),
+            1
+        )
+        from public.user_books ub
+        where ub."BID" = new."BID";
+    end if;
+    return null;
+end;
+$$;
+
+create or replace trigger book_lib_status_apply_counts
+after insert or update or delete on public.book_lib_status
+for each row execute function public.book_lib_status_apply_counts();
+
+
+-- user_books link changes, applying every library status of the book
+create or replace function public.user_books_apply_counts()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.apply_user_lib_counts(
+            array_agg(old."UserName"),
+            array_agg(bls."BranchName"),
+            array_agg(bls."Avail"),
+            -1
+        )
+        from public.book_lib_status bls
+        where bls."BID" = old."BID";
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.apply_user_lib_counts(
+            array_agg(new."UserName"),
+            array_agg(bls."BranchName"),
+            array_agg(bls."Avail"),
+            1
+        )
+        from public.book_lib_status bls
+        where bls."BID" = new."BID";
+    end if;
+    return null;
+end;
+$$;
+
+create or replace trigger user_books_apply_counts
+after insert or update or delete on public.user_books
+for each row execute function public.user_books_apply_counts();
+
+
+-- Unlink owners before a book is deleted. Cascaded deletes of user_books and
+-- books_avail fire their triggers in no set order, and the user_books triggers
+-- need the book_lib_status rows that the books_avail triggers remove.
+create or replace function public.books_info_unlink_owners()
+returns trigger
+language plpgsql
+as $$
+begin
+    delete from public.user_books ub where ub."BID" = old."BID";
+    return old;
+end;
+$$;
+
+create or replace trigger books_info_unlink_owners
+before delete on public.books_info
+for each row execute function public.books_info_unlink_owners();
+
+-- Backfill from existing rows, user counts follow through the triggers
+select public.refresh_book_lib_status(array(select distinct ba."BID" from public.books_avail ba));
+
+
+-- Same signature as before, now reading the summary table
+create or replace function public.lib_book_counts(username text)
+returns table ("BranchName" text, "AvailBooks" bigint, "AllBooks" bigint)
+language sql
+stable
+as $$
+    select
+        nullif(ulc."BranchName", '') as "BranchName",
+        ulc."AvailBooks",
+        ulc."AllBooks"
+    from public.user_lib_counts ulc
+    where ulc."UserName" = lib_book_counts.username
+    order by nullif(ulc."BranchName", '') nulls first;
+$$;
@@ -0,0 +1,96 @@
+-- Serialize the user_lib_counts triggers per book. A user_books link change
+-- and a book_lib_status change of the same BID each read the other table, so
+-- when they ran concurrently neither saw the other and the counts drifted,
+-- e.g. two users saving a popular title while its availability is refreshed.
+-- Both now take a transaction level advisory lock on the BID first, so the
+-- second waits for the first to commit and then reads its rows.
+
+-- Refreshes lock their BIDs in order, so two refreshes cannot deadlock
+create or replace function public.refresh_book_lib_status(bids bigint[])
+returns void
+language plpgsql
+volatile
+as $$
+begin
+    perform pg_advisory_xact_lock(locked.bid)
+    from (select distinct bid from unnest(bids) as bid order by bid) as locked;
+
+    with new_status as (
+        select
+            avails."BID",
+            coalesce(avails."BranchName", '') as "BranchName",
+            coalesce(bool_or(avails."StatusDesc" = 'Available'), false) as "Avail"
+        from (
+            select
+                ba."BID",
+                trim(replace(replace(ba."BranchName", 'Public', ''), 'Library', ''))
+                    as "BranchName",
+                ba."StatusDesc"
+            from public.books_avail ba
+            where ba."BID" = any(bids)
+        ) as avails
+        group by grouping sets ((avails."BID", avails."BranchName"), (avails."BID"))
+    ),
+    deleted as (
+        delete from public.book_lib_status bls
+        where bls."BID" = any(bids)
+            and not exists (
+                select 1 from new_status n
+                where n."BID" = bls."BID" and n."BranchName" = bls."BranchName"
+            )
+    )
+    -- Rows whose flag did not change are left alone, so their triggers do not fire
+    insert into public.book_lib_status as bls
+    select n."BID", n."BranchName", n."Avail"
+    from new_status n
+    on conflict ("BID", "BranchName") do update
+    set "Avail" = excluded."Avail"
+    where bls."Avail" is distinct from excluded."Avail";
+end;
+$$;
+
+create or replace function public.user_books_apply_counts()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform pg_advisory_xact_lock(old."BID");
+        perform public.apply_user_lib_counts(
+            array_agg(old."UserName"),
+            array_agg(bls."BranchName"),
+            array_agg(bls."Avail"),
+            -1
+        )
+        from public.book_lib_status bls
+        where bls."BID" = old."BID";
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform pg_advisory_xact_lock(new."BID");
+        perform public.apply_user_lib_counts(
+            array_agg(new."UserName"),
+            array_agg(bls."BranchName"),
+            array_agg(bls."Avail"),
+            1
+        )
+        from public.book_lib_status bls
+        where bls."BID" = new."BID";
+    end if;
+    return null;
+end;
+$$;
+
+
+-- Repair counts that drifted before this migration
+select public.refresh_book_lib_status(array(select distinct ba."BID" from public.books_avail ba));
+
+delete from public.book_lib_status bls
+where not exists (select 1 from public.books_avail ba where ba."BID" = bls."BID");
+
+truncate public.user_lib_counts;
+
+insert into public.user_lib_counts ("UserName", "BranchName", "AvailBooks", "AllBooks")
+select ub."UserName", bls."BranchName", count(*) filter (where bls."Avail"), count(*)
+from public.user_books ub
+join public.book_lib_status bls on bls."BID" = ub."BID"
+group by ub."UserName", bls."BranchName";